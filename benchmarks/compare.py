@@ -0,0 +1,65 @@
+"""
+Compares two harness.py reports endpoint by endpoint.
+
+    $ pipenv run python benchmarks/compare.py before.json after.json --threshold 10
+
+Prints p50/p95/p99, throughput and SQL statements per request side by side and marks
+every endpoint whose p95 or throughput got worse by more than --threshold percent.
+With --fail-on-regression the exit status is 1 when anything regressed, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+COLUMNS = [('p50_ms', False), ('p95_ms', False), ('p99_ms', False), ('rps', True), ('queries', False)]
+
+def change(before, after, higher_is_better):
+    if before in (None, 0) or after is None:
+        return None
+    delta = (after - before) / before * 100
+    return -delta if higher_is_better else delta
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10, help='regression threshold in percent')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    for key in ('mode', 'database', 'volumes', 'concurrency'):
+        if before['meta'].get(key) != after['meta'].get(key):
+            print(f"warning: {key} differs ({before['meta'].get(key)} vs {after['meta'].get(key)})")
+    print(f"{before['meta'].get('revision')} -> {after['meta'].get('revision')}\n")
+
+    header = f"{'endpoint':<24}" + ''.join(f'{name:>26}' for name, _ in COLUMNS)
+    print(header)
+    regressions = []
+    for endpoint in sorted(set(before['results']) | set(after['results'])):
+        old, new = before['results'].get(endpoint, {}), after['results'].get(endpoint, {})
+        if 'p50_ms' not in old or 'p50_ms' not in new:
+            print(f'{endpoint:<24}  skipped')
+            continue
+        cells = []
+        for name, higher_is_better in COLUMNS:
+            delta = change(old.get(name), new.get(name), higher_is_better)
+            if delta is None:
+                cells.append(f'{"-":>26}')
+                continue
+            # Positivo = peor
+            cells.append(f'{old[name]:>10} -> {new[name]:<8} {delta:+5.0f}%')
+            if name in ('p95_ms', 'rps', 'queries') and delta > args.threshold:
+                regressions.append(f'{endpoint} {name} {delta:+.0f}%')
+        print(f'{endpoint:<24}' + ''.join(cells))
+
+    if regressions:
+        print('\nregressions:\n  ' + '\n  '.join(regressions))
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+if __name__ == '__main__':
+    main()
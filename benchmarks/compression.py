@@ -0,0 +1,129 @@
+"""
+CPU cost against bytes saved of response compression, per endpoint and codec setting.
+
+    $ pipenv run python benchmarks/compression.py --output compression.json
+
+Seeds the database like harness.py, fetches each endpoint once uncompressed, then times
+gzip (levels 1/6/9) and brotli (qualities 1/4/11, when installed) on the exact bytes the
+app sends. compress_ms is what a request pays when the body is compressed on the fly;
+a response cache hit serves the variant stored at miss time and pays nothing. The last
+block times cached hits end to end with and without Accept-Encoding.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+
+from harness import SRC, git_revision, percentile, seed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENDPOINTS = [
+    ('list_people', '/people?limit=200'),
+    ('list_planets', '/planets?limit=200'),
+    ('list_people_fields', '/people?fields=name,url&limit=200'),
+    ('get_person', '/people/1'),
+    ('get_planet_include', '/planets/1?include=residents'),
+    ('export_people_ndjson', '/people?format=ndjson'),
+    ('metrics', '/metrics'),
+]
+
+def gzip_compress(body, level):
+    # Mismo formato que compression.compress (cabecera gzip, wbits=31)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+def codecs():
+    settings = {f'gzip-{level}': (lambda body, level=level: gzip_compress(body, level)) for level in (1, 6, 9)}
+    if brotli is not None:
+        settings.update({f'br-{quality}': (lambda body, quality=quality: brotli.compress(body, quality=quality))
+                         for quality in (1, 4, 11)})
+    return settings
+
+def best_time(function, body, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(body)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def cached_hits(client, path, headers, requests):
+    client.get(path, headers=headers)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': round(percentile(timings, 50), 3), 'bytes': len(response.data),
+            'encoding': response.headers.get('Content-Encoding'), 'cache': response.headers.get('X-Cache')}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:////tmp/bench.db')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--people', type=int, default=1000)
+    parser.add_argument('--planets', type=int, default=200)
+    parser.add_argument('--favorites', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20, help='timed compressions per codec (best is kept)')
+    parser.add_argument('--requests', type=int, default=200, help='cached hits per endpoint')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args()
+    args.favorites = min(args.favorites, args.users * (args.people + args.planets))
+
+    os.environ.update(DATABASE_URL=args.database_url, CACHE_TYPE='lru', PROFILER_ENABLED='0')
+    sys.path.insert(0, SRC)
+    seed(args)
+    from app import create_app
+    app = create_app()
+
+    client = app.test_client()
+    results = {}
+    for name, path in ENDPOINTS:
+        body = client.get(path, headers={'Accept-Encoding': 'identity'}).get_data()
+        results[name] = {'path': path, 'bytes': len(body), 'codecs': {}}
+        for codec, function in codecs().items():
+            seconds = best_time(function, body, args.repeat)
+            size = len(function(body))
+            results[name]['codecs'][codec] = {
+                'bytes': size,
+                'saved_pct': round(100 * (1 - size / len(body)), 1) if body else 0,
+                'compress_ms': round(seconds * 1000, 3),
+                'mb_per_s': round(len(body) / seconds / 1e6, 1) if seconds else None,
+            }
+            print(f"{name:<22} {codec:<8} {len(body):>9} -> {size:>8} B  {seconds * 1000:>8.3f} ms", file=sys.stderr)
+
+    hits = {}
+    for name, path in ENDPOINTS:
+        if name in ('export_people_ndjson', 'metrics'):
+            continue
+        hits[name] = {
+            'identity': cached_hits(client, path, {'Accept-Encoding': 'identity'}, args.requests),
+            'gzip': cached_hits(client, path, {'Accept-Encoding': 'gzip'}, args.requests),
+        }
+        if brotli is not None:
+            hits[name]['br'] = cached_hits(client, path, {'Accept-Encoding': 'br'}, args.requests)
+
+    report = {
+        'meta': {'revision': git_revision(), 'date': datetime.now().isoformat(timespec='seconds'),
+                 'database': args.database_url.split(':', 1)[0], 'brotli': brotli is not None,
+                 'volumes': {'people': args.people, 'planets': args.planets}},
+        'results': results,
+        'cached_hits': hits,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Serialization microbenchmark: rows/sec of the old hand-written serialize() + json.dumps
+(what jsonify did) against the generated serializers, orjson, the app's JSON provider as
+jsonify calls it and sparse fieldsets.
+
+    $ pipenv run python benchmarks/serializers.py --rows 20000
+
+No database is needed: rows are transient Person instances built in memory.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask
+from models import Person
+from utils import FastJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def legacy_serialize(self):
+    # Copia del Person.serialize() anterior a los serializadores generados
+    return {
+        "id": self.id,
+        "birth_year": self.birth_year,
+        "eye_color": self.eye_color,
+        "films": self.films,
+        "gender": self.gender,
+        "hair_color": self.hair_color,
+        "height": self.height,
+        "homeworld": self.homeworld,
+        "mass": self.mass,
+        "name": self.name,
+        "skin_color": self.skin_color,
+        "created_at": self.created_at.isoformat(),
+        "edited_at": self.edited_at.isoformat(),
+        "species": self.species,
+        "starships": self.starships,
+        "url": self.url,
+        "vehicles": self.vehicles
+    }
+
+def make_rows(count):
+    films = [f'https://swapi.dev/api/films/{i}/' for i in range(1, 7)]
+    now = datetime.now()
+    return [
+        Person(id=i, birth_year='19BBY', eye_color='blue', films=films, gender='male', hair_color='blond',
+               height='172', homeworld='https://swapi.dev/api/planets/1/', mass='77', name=f'Person {i}',
+               skin_color='fair', created_at=now, edited_at=now, species=[], starships=films[:2],
+               url=f'https://swapi.dev/api/people/{i}/', vehicles=films[:1])
+        for i in range(count)
+    ]
+
+def bench(rows, serialize, dumps, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dumps([serialize(row) for row in rows])
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    json_dumps = lambda obj: json.dumps(obj, sort_keys=True)  # Flask 2.2 jsonify default
+    cases = {
+        'legacy serialize + json': (lambda row: legacy_serialize(row), json_dumps),
+        'generated serializer + json': (Person.serializer(), json_dumps),
+        'generated serializer + json (fields=name,url)': (Person.serializer(('id', 'name', 'url')), json_dumps),
+    }
+    if orjson is not None:
+        cases['generated serializer + orjson'] = (Person.serializer(), orjson.dumps)
+        # Lo que hace jsonify: provider.dumps con separators compactos y sort_keys
+        provider = FastJSONProvider(Flask(__name__))
+        cases['generated serializer + FastJSONProvider'] = (Person.serializer(),
+                                                            lambda obj: provider.dumps(obj, separators=(',', ':')))
+        cases['generated serializer + orjson (fields=name,url)'] = (Person.serializer(('id', 'name', 'url')), orjson.dumps)
+    else:
+        print('orjson is not installed, skipping the orjson cases')
+
+    baseline = None
+    for name, (serialize, dumps) in cases.items():
+        rate = bench(rows, serialize, dumps, args.repeat)
+        baseline = baseline or rate
+        print(f'{name:<50} {rate:>12,.0f} rows/s  x{rate / baseline:.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Concurrency stress test for POST /users against a running server.
+
+    $ gunicorn wsgi --chdir ./src/ -w 4 &
+    $ pipenv run python benchmarks/signup_stress.py --base-url http://localhost:8000 --signups 500
+
+Fires parallel signups with unique emails plus a burst of racing signups that all share
+one email, then checks that every id is distinct, that exactly one of the racing
+requests won, and that p99 latency stays under --max-p99-ms. Exits 1 on any failure.
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def signup(base_url, email):
+    body = json.dumps({'email': email, 'password': 'secret'}).encode()
+    request = urllib.request.Request(f'{base_url}/users', data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status, payload = response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        status, payload = error.code, json.loads(error.read() or b'{}')
+    return status, payload, (time.perf_counter() - start) * 1000
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:3000')
+    parser.add_argument('--signups', type=int, default=500)
+    parser.add_argument('--racers', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-p99-ms', type=float, default=500)
+    args = parser.parse_args()
+
+    run = uuid.uuid4().hex[:8]
+    emails = [f'stress-{run}-{i}@example.com' for i in range(args.signups)]
+    racing_email = f'stress-{run}-race@example.com'
+    emails += [racing_email] * args.racers
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda email: signup(args.base_url, email), emails))
+
+    unique = results[:args.signups]
+    racing = results[args.signups:]
+    latencies = [ms for _, _, ms in results]
+    failures = []
+
+    bad = [status for status, _, _ in unique if status != 201]
+    if bad:
+        failures.append(f'{len(bad)} unique signups failed: statuses {sorted(set(bad))}')
+    ids = [payload.get('id') for status, payload, _ in results if status == 201]
+    if len(ids) != len(set(ids)):
+        failures.append(f'{len(ids) - len(set(ids))} duplicated ids')
+    winners = [status for status, _, _ in racing if status == 201]
+    if len(winners) != 1:
+        failures.append(f'{len(winners)} racing signups succeeded for the same email (expected 1)')
+    p99 = percentile(latencies, 99)
+    if p99 > args.max_p99_ms:
+        failures.append(f'p99 {p99:.1f} ms over {args.max_p99_ms} ms')
+
+    print(json.dumps({
+        'requests': len(results),
+        'created': len(ids),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(p99, 2),
+        'failures': failures,
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Worker cold start: import time of the WSGI entry point and memory of gunicorn workers,
+with and without admin/swagger and with and without preload.
+
+    $ pipenv run python benchmarks/startup.py --workers 4 --output startup.json
+
+For each profile ("full", and "api-only" with ADMIN_ENABLED=0 SWAGGER_ENABLED=0) the
+entry point is imported --repeat times in fresh interpreters: wall time, loaded modules,
+RSS after import and the slowest packages (python -X importtime). Then gunicorn
+is started with GUNICORN_PRELOAD=0 and 1: time until the first response and RSS/PSS per
+worker. PSS splits shared pages between the processes that map them, so it shows what
+preload saves; RSS counts the shared pages once per worker. Needs Linux (/proc) and
+gunicorn.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+from harness import ROOT, SRC, git_revision
+
+PROFILES = {
+    'full': {},
+    'api-only': {'ADMIN_ENABLED': '0', 'SWAGGER_ENABLED': '0'},
+}
+
+MEASURE_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import wsgi
+elapsed = time.perf_counter() - start
+rss = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS:'))
+print(json.dumps({'import_s': elapsed, 'modules': len(sys.modules), 'rss_mb': rss / 1024}))
+"""
+
+def measure_imports(env, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE_IMPORT], cwd=SRC, env=env, text=True)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'import_ms': round(statistics.median(run['import_s'] for run in runs) * 1000, 1),
+        'modules': runs[-1]['modules'],
+        'rss_mb': round(statistics.median(run['rss_mb'] for run in runs), 1),
+    }
+
+def slowest_imports(env, top):
+    # Coste por paquete de primer nivel: su import acumulado mas lento (-X importtime, en stderr)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wsgi'], cwd=SRC, env=env,
+                            capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        if package and package != 'wsgi':
+            packages[package] = max(packages.get(package, 0), int(cumulative))
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': package, 'cumulative_ms': round(us / 1000, 1)} for package, us in ranked]
+
+def worker_memory(master_pid):
+    # RSS y PSS (smaps_rollup) de cada worker de gunicorn
+    workers = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                if int(stat.read().rsplit(')', 1)[1].split()[1]) != master_pid:
+                    continue
+            values = {}
+            with open(f'/proc/{pid}/smaps_rollup') as smaps:
+                for line in smaps:
+                    key = line.split(':')[0]
+                    if key in ('Rss', 'Pss'):
+                        values[key] = int(line.split()[1])
+            workers.append({'rss_mb': round(values['Rss'] / 1024, 1), 'pss_mb': round(values['Pss'] / 1024, 1)})
+        except (OSError, ValueError, IndexError, KeyError):
+            continue
+    return workers
+
+def measure_gunicorn(env, args, preload):
+    env = dict(env, GUNICORN_PRELOAD='1' if preload else '0')
+    command = ['gunicorn', 'wsgi', '--chdir', SRC, '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '-w', str(args.workers), '-b', f'127.0.0.1:{args.port}', '--log-level', 'warning']
+    start = time.perf_counter()
+    server = subprocess.Popen(command, env=env)
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{args.port}/', timeout=1).read()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise SystemExit('gunicorn did not start')
+                time.sleep(0.05)
+        first_response = time.perf_counter() - start
+        # Cada worker atiende algunas peticiones antes de medir su memoria
+        for _ in range(args.workers * 20):
+            urllib.request.urlopen(f'http://127.0.0.1:{args.port}/users?limit=5', timeout=10).read()
+        workers = worker_memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {
+        'first_response_ms': round(first_response * 1000, 1),
+        'workers': workers,
+        'rss_mb_total': round(sum(worker['rss_mb'] for worker in workers), 1),
+        'pss_mb_total': round(sum(worker['pss_mb'] for worker in workers), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:////tmp/bench.db')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per import measurement')
+    parser.add_argument('--top', type=int, default=10, help='slowest packages to report')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--skip-gunicorn', action='store_true')
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args()
+
+    base_env = dict(os.environ, DATABASE_URL=args.database_url, PROFILER_ENABLED='0')
+    results = {}
+    for name, overrides in PROFILES.items():
+        env = dict(base_env, **overrides)
+        results[name] = {'import': measure_imports(env, args.repeat), 'slowest_imports': slowest_imports(env, args.top)}
+        print(f"{name:<9} import {results[name]['import']['import_ms']:>7} ms  "
+              f"{results[name]['import']['modules']} modules  rss {results[name]['import']['rss_mb']} MB", file=sys.stderr)
+        if args.skip_gunicorn:
+            continue
+        for preload in (False, True):
+            key = 'gunicorn_preload' if preload else 'gunicorn'
+            results[name][key] = measure_gunicorn(env, args, preload)
+            print(f"{name:<9} {key:<16} first response {results[name][key]['first_response_ms']:>7} ms  "
+                  f"rss {results[name][key]['rss_mb_total']} MB  pss {results[name][key]['pss_mb_total']} MB",
+                  file=sys.stderr)
+
+    report = {
+        'meta': {'revision': git_revision(), 'date': datetime.now().isoformat(timespec='seconds'),
+                 'python': sys.version.split()[0], 'workers': args.workers},
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+# Configuracion de gunicorn: se carga sola al arrancar desde la raiz del repo (Procfile, render.yaml)
+import gc
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+
+# Con preload la app se importa una vez en el master y los workers comparten sus paginas
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+def pre_fork(server, worker):
+    # Los objetos creados al importar no se vuelven a tocar: el GC no ensucia esas paginas
+    if server.cfg.preload_app:
+        gc.freeze()
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el master no se pueden compartir entre procesos
+    if not server.cfg.preload_app:
+        return
+    from models import db
+    application = server.app.wsgi()
+    with application.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
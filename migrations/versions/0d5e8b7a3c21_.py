@@ -0,0 +1,73 @@
+"""person_refs/planet_refs lookup tables for list columns
+
+Revision ID: 0d5e8b7a3c21
+Revises: f2a6c9d41e58
+Create Date: 2026-10-17 15:10:44.871206
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d5e8b7a3c21'
+down_revision = 'f2a6c9d41e58'
+branch_labels = None
+depends_on = None
+
+REFS = [
+    ('person_refs', 'person', 'person_id', ['films', 'species', 'starships', 'vehicles']),
+    ('planet_refs', 'planet', 'planet_id', ['films', 'residents']),
+]
+
+ARRAY_INDEXES = [
+    ('ix_person_films', 'person', 'films'),
+    ('ix_person_species', 'person', 'species'),
+    ('ix_person_starships', 'person', 'starships'),
+    ('ix_person_vehicles', 'person', 'vehicles'),
+    ('ix_planet_films', 'planet', 'films'),
+    ('ix_planet_residents', 'planet', 'residents'),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, owner_table, owner, kinds in REFS:
+        refs = op.create_table(
+            table,
+            sa.Column(owner, sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('url', sa.String(length=450), nullable=False),
+            sa.ForeignKeyConstraint([owner], [f'{owner_table}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(owner, 'kind', 'url'),
+        )
+        op.create_index(f'ix_{table}_kind_url', table, ['kind', 'url'], unique=False)
+
+        # Una fila por url de cada lista
+        rows = {}
+        for record in bind.execute(sa.text(f"SELECT id, {', '.join(kinds)} FROM {owner_table}")).mappings():
+            for kind in kinds:
+                urls = record[kind]
+                if isinstance(urls, str):
+                    urls = json.loads(urls)
+                for url in urls or ():
+                    rows[(record['id'], kind, url)] = {owner: record['id'], 'kind': kind, 'url': url}
+        if rows:
+            op.bulk_insert(refs, list(rows.values()))
+
+    # Los filtros usan las tablas de referencias: los GIN sobre ARRAY ya no se leen
+    if bind.dialect.name == 'postgresql':
+        for name, table, _ in ARRAY_INDEXES:
+            op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, table, column in ARRAY_INDEXES:
+            op.create_index(name, table, [column], unique=False, postgresql_using='gin')
+
+    for table, _, _, _ in reversed(REFS):
+        op.drop_index(f'ix_{table}_kind_url', table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,31 @@
+"""unique favorites per user and target
+
+Revision ID: 3f1c7d2a9b4e
+Revises: 9c3242624a24
+Create Date: 2026-10-17 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c7d2a9b4e'
+down_revision = '9c3242624a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicated favorites before enforcing uniqueness, keeping the oldest row
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM favorites GROUP BY user_id, planet_id, people_id) AS keep)"
+    )
+    op.create_index('ix_favorites_user_planet', 'favorites', ['user_id', 'planet_id'], unique=True)
+    op.create_index('ix_favorites_user_people', 'favorites', ['user_id', 'people_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_favorites_user_people', table_name='favorites')
+    op.drop_index('ix_favorites_user_planet', table_name='favorites')
@@ -0,0 +1,27 @@
+"""sync users id sequence
+
+Revision ID: 5b2d9e7f1a63
+Revises: 8a7e5c41d2f0
+Create Date: 2026-10-17 11:20:05.772614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2d9e7f1a63'
+down_revision = '8a7e5c41d2f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Users used to be inserted with explicit ids (count + 1), which never advanced the
+    # serial sequence; move it past the current max so database-assigned ids don't collide.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM users")
+
+
+def downgrade():
+    pass
@@ -0,0 +1,36 @@
+"""unique url index on person and planet for the bulk upsert
+
+Revision ID: 7e4a2c9d5b18
+Revises: 0d5e8b7a3c21
+Create Date: 2026-10-18 10:12:37.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e4a2c9d5b18'
+down_revision = '0d5e8b7a3c21'
+branch_labels = None
+depends_on = None
+
+TABLES = ('person', 'planet')
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        # Los duplicados se resuelven a mano: cada fila puede tener su resumen y sus favoritos
+        duplicates = bind.execute(sa.text(
+            f'SELECT url, COUNT(*) FROM {table} GROUP BY url HAVING COUNT(*) > 1'
+        )).all()
+        if duplicates:
+            urls = ', '.join(url for url, _ in duplicates[:10])
+            raise RuntimeError(f'{table} has {len(duplicates)} duplicated urls, merge them before upgrading: {urls}')
+        op.create_index(op.f(f'ix_{table}_url'), table, ['url'], unique=True)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_url'), table_name=table)
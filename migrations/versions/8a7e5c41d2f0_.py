@@ -0,0 +1,31 @@
+"""indexes for favorites and summary lookups
+
+Revision ID: 8a7e5c41d2f0
+Revises: 3f1c7d2a9b4e
+Create Date: 2026-10-17 10:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a7e5c41d2f0'
+down_revision = '3f1c7d2a9b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # favorites(user_id, ...) lookups are served by the unique indexes from 3f1c7d2a9b4e
+    op.create_index(op.f('ix_favorites_planet_id'), 'favorites', ['planet_id'], unique=False)
+    op.create_index(op.f('ix_favorites_people_id'), 'favorites', ['people_id'], unique=False)
+    op.create_index(op.f('ix_people_person_id'), 'people', ['person_id'], unique=False)
+    op.create_index(op.f('ix_planets_planet_id'), 'planets', ['planet_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_planets_planet_id'), table_name='planets')
+    op.drop_index(op.f('ix_people_person_id'), table_name='people')
+    op.drop_index(op.f('ix_favorites_people_id'), table_name='favorites')
+    op.drop_index(op.f('ix_favorites_planet_id'), table_name='favorites')
@@ -7,6 +7,7 @@ Create Date: 2024-08-21 18:45:13.516016
 """
 from alembic import op
 import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
 
 
 # revision identifiers, used by Alembic.
@@ -15,6 +16,9 @@ down_revision = 'a5cffa318ac2'
 branch_labels = None
 depends_on = None
 
+# Listas de urls: ARRAY en Postgres, JSON en el resto (SQLite), como models.StringList
+STRING_LIST = sa.JSON().with_variant(postgresql.ARRAY(sa.String()), 'postgresql')
+
 
 def upgrade():
     # ### commands auto generated by Alembic - please adjust! ###
@@ -22,7 +26,7 @@ def upgrade():
     sa.Column('id', sa.Integer(), nullable=False),
     sa.Column('birth_year', sa.String(length=150), nullable=False),
     sa.Column('eye_color', sa.String(length=150), nullable=False),
-    sa.Column('films', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('films', STRING_LIST, nullable=False),
     sa.Column('gender', sa.String(length=150), nullable=False),
     sa.Column('hair_color', sa.String(length=150), nullable=False),
     sa.Column('height', sa.String(length=150), nullable=False),
@@ -32,10 +36,10 @@ def upgrade():
     sa.Column('skin_color', sa.String(length=150), nullable=False),
     sa.Column('created_at', sa.DateTime(), nullable=False),
     sa.Column('edited_at', sa.DateTime(), nullable=False),
-    sa.Column('species', sa.ARRAY(sa.String()), nullable=False),
-    sa.Column('starships', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('species', STRING_LIST, nullable=False),
+    sa.Column('starships', STRING_LIST, nullable=False),
     sa.Column('url', sa.String(length=150), nullable=False),
-    sa.Column('vehicles', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('vehicles', STRING_LIST, nullable=False),
     sa.PrimaryKeyConstraint('id')
     )
     op.create_table('planet',
@@ -44,12 +48,12 @@ def upgrade():
     sa.Column('created_at', sa.DateTime(), nullable=False),
     sa.Column('edited_at', sa.DateTime(), nullable=False),
     sa.Column('diameter', sa.String(length=150), nullable=False),
-    sa.Column('films', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('films', STRING_LIST, nullable=False),
     sa.Column('gravity', sa.String(length=150), nullable=False),
     sa.Column('name', sa.String(length=150), nullable=False),
     sa.Column('orbital_period', sa.String(length=150), nullable=False),
     sa.Column('population', sa.String(length=150), nullable=False),
-    sa.Column('residents', sa.ARRAY(sa.String()), nullable=False),
+    sa.Column('residents', STRING_LIST, nullable=False),
     sa.Column('rotation_period', sa.String(length=150), nullable=False),
     sa.Column('surface_water', sa.String(length=150), nullable=False),
     sa.Column('terrain', sa.String(length=150), nullable=False),
@@ -0,0 +1,38 @@
+"""text_pattern_ops indexes for prefix filters on Postgres
+
+Revision ID: b6d3f8a2e915
+Revises: 7e4a2c9d5b18
+Create Date: 2026-10-18 16:04:51.730264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d3f8a2e915'
+down_revision = '7e4a2c9d5b18'
+branch_labels = None
+depends_on = None
+
+# Los btree de c4e8a1f0b372 solo sirven LIKE 'x%' con collation C; estos sirven ?field__prefix=
+PATTERN_INDEXES = [
+    ('ix_person_gender_pattern', 'person', 'gender'),
+    ('ix_person_homeworld_pattern', 'person', 'homeworld'),
+    ('ix_planet_climate_pattern', 'planet', 'climate'),
+    ('ix_planet_terrain_pattern', 'planet', 'terrain'),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, column in PATTERN_INDEXES:
+        op.create_index(name, table, [column], unique=False, postgresql_ops={column: 'text_pattern_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _ in reversed(PATTERN_INDEXES):
+        op.drop_index(name, table_name=table)
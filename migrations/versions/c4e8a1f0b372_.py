@@ -0,0 +1,57 @@
+"""indexes for catalogue filters and name search
+
+Revision ID: c4e8a1f0b372
+Revises: 5b2d9e7f1a63
+Create Date: 2026-10-17 12:41:53.208337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f0b372'
+down_revision = '5b2d9e7f1a63'
+branch_labels = None
+depends_on = None
+
+ARRAY_INDEXES = [
+    ('ix_person_films', 'person', 'films'),
+    ('ix_person_species', 'person', 'species'),
+    ('ix_person_starships', 'person', 'starships'),
+    ('ix_person_vehicles', 'person', 'vehicles'),
+    ('ix_planet_films', 'planet', 'films'),
+    ('ix_planet_residents', 'planet', 'residents'),
+]
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+
+    op.create_index(op.f('ix_person_gender'), 'person', ['gender'], unique=False)
+    op.create_index(op.f('ix_person_homeworld'), 'person', ['homeworld'], unique=False)
+    op.create_index(op.f('ix_planet_climate'), 'planet', ['climate'], unique=False)
+    op.create_index(op.f('ix_planet_terrain'), 'planet', ['terrain'], unique=False)
+
+    # Trigram (?q= and prefix search) and ARRAY containment indexes only exist on Postgres
+    if postgres:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_people_name_trgm', 'people', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_planets_name_trgm', 'planets', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        for name, table, column in ARRAY_INDEXES:
+            op.create_index(name, table, [column], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, table, _ in reversed(ARRAY_INDEXES):
+            op.drop_index(name, table_name=table)
+        op.drop_index('ix_planets_name_trgm', table_name='planets')
+        op.drop_index('ix_people_name_trgm', table_name='people')
+
+    op.drop_index(op.f('ix_planet_terrain'), table_name='planet')
+    op.drop_index(op.f('ix_planet_climate'), table_name='planet')
+    op.drop_index(op.f('ix_person_homeworld'), table_name='person')
+    op.drop_index(op.f('ix_person_gender'), table_name='person')
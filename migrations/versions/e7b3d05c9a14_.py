@@ -0,0 +1,58 @@
+"""numeric shadow columns for catalogue stats and sorting
+
+Revision ID: e7b3d05c9a14
+Revises: c4e8a1f0b372
+Create Date: 2026-10-17 13:05:27.614092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d05c9a14'
+down_revision = 'c4e8a1f0b372'
+branch_labels = None
+depends_on = None
+
+SHADOWS = {
+    'person': {'height': 'height_num', 'mass': 'mass_num'},
+    'planet': {'diameter': 'diameter_num', 'orbital_period': 'orbital_period_num', 'population': 'population_num'},
+}
+
+
+def _parse_number(value):
+    # Copia de models.parse_number: la migracion no depende del codigo de la app
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade():
+    for table, columns in SHADOWS.items():
+        for shadow in columns.values():
+            op.add_column(table, sa.Column(shadow, sa.Float(), nullable=True))
+
+    # Rellenar las columnas nuevas desde las de texto
+    bind = op.get_bind()
+    for table, columns in SHADOWS.items():
+        rows = bind.execute(sa.text(f"SELECT id, {', '.join(columns)} FROM {table}")).mappings().all()
+        if not rows:
+            continue
+        assignments = ', '.join(f'{shadow} = :{shadow}' for shadow in columns.values())
+        bind.execute(
+            sa.text(f'UPDATE {table} SET {assignments} WHERE id = :id'),
+            [dict({shadow: _parse_number(row[source]) for source, shadow in columns.items()}, id=row['id']) for row in rows],
+        )
+
+    for table, columns in SHADOWS.items():
+        for shadow in columns.values():
+            op.create_index(op.f(f'ix_{table}_{shadow}'), table, [shadow], unique=False)
+
+
+def downgrade():
+    for table, columns in SHADOWS.items():
+        for shadow in columns.values():
+            op.drop_index(op.f(f'ix_{table}_{shadow}'), table_name=table)
+            op.drop_column(table, shadow)
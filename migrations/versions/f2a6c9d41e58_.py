@@ -0,0 +1,44 @@
+"""favorite_count counters on users, people and planets
+
+Revision ID: f2a6c9d41e58
+Revises: e7b3d05c9a14
+Create Date: 2026-10-17 14:22:08.390517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c9d41e58'
+down_revision = 'e7b3d05c9a14'
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    ('users', 'user_id'),
+    ('people', 'people_id'),
+    ('planets', 'planet_id'),
+]
+
+
+def upgrade():
+    for table, _ in COUNTERS:
+        op.add_column(table, sa.Column('favorite_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Contadores iniciales desde la tabla de favoritos
+    for table, column in COUNTERS:
+        op.execute(
+            f'UPDATE {table} SET favorite_count = '
+            f'(SELECT count(*) FROM favorites WHERE favorites.{column} = {table}.id)'
+        )
+
+    op.create_index(op.f('ix_people_favorite_count'), 'people', ['favorite_count'], unique=False)
+    op.create_index(op.f('ix_planets_favorite_count'), 'planets', ['favorite_count'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_planets_favorite_count'), table_name='planets')
+    op.drop_index(op.f('ix_people_favorite_count'), table_name='people')
+    for table, _ in reversed(COUNTERS):
+        op.drop_column(table, 'favorite_count')
@@ -1,9 +1,12 @@
 import os
-from flask_admin import Admin
+from flask import Blueprint, current_app, jsonify
 from models import db, User
-from flask_admin.contrib.sqla import ModelView
 
 def setup_admin(app):
+    # Flask-Admin solo se importa si el panel esta activo (ADMIN_ENABLED)
+    from flask_admin import Admin
+    from flask_admin.contrib.sqla import ModelView
+
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
@@ -13,4 +16,15 @@ def setup_admin(app):
     admin.add_view(ModelView(User, db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ModelView(YourModelName, db.session))
+
+def setup_spec(app):
+    spec = Blueprint('spec', __name__)
+
+    @spec.route('/spec', methods=['GET'])
+    def get_spec():
+        # flask_swagger se importa en la primera peticion, no al arrancar el worker
+        from flask_swagger import swagger
+        return jsonify(swagger(current_app)), 200
+
+    app.register_blueprint(spec)
@@ -2,72 +2,133 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+import click
+from datetime import datetime
+from flask import Blueprint, Flask, current_app, request, jsonify
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, People, Planets, Favorite, Person, Planet
-
-
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from utils import APIException, generate_sitemap, paginate, paginated_response, stream_format, stream_rows, make_etag, conditional_response, requested_fields, load_fields, sparse_query, FastJSONProvider
+from admin import setup_admin, setup_spec
+from instrumentation import setup_instrumentation
+from compression import setup_compression
+from profiler import setup_profiler
+from cache import setup_cache, cached, invalidate, invalidate_all
+from bulk import load_records, import_people, import_planets
+from commands import setup_commands
+from pool import engine_options, setup_pool_stats
+from filters import PEOPLE_FILTERS, PLANET_FILTERS
+from writebehind import setup_favorites_queue, favorites_queue
+from stats import catalogue_stats, popular_items
+from includes import setup_includes, include_tree, include_response
+from snapshot import setup_snapshot
+from models import db, insert_ignore, inserted, favorite_recounts, user_values, created_user, favorites_expand, favorites_options, User, People, Planets, Favorite, Person, Planet
+
+
+api = Blueprint('api', __name__)
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    if os.getenv('JSON_FAST_ENCODER', '1') == '1':
+        app.json = FastJSONProvider(app)
+
+    # Lo que se pase en config tiene prioridad sobre el entorno
+    app.config.from_mapping(config or {})
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config.setdefault('SQLALCHEMY_DATABASE_URI', db_url.replace("postgres://", "postgresql://"))
+    else:
+        app.config.setdefault('SQLALCHEMY_DATABASE_URI', "sqlite:////tmp/test.db")
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('PAGE_SIZE', int(os.getenv('PAGE_SIZE', 50)))
+    app.config.setdefault('MAX_PAGE_SIZE', int(os.getenv('MAX_PAGE_SIZE', 200)))
+    app.config.setdefault('STREAM_BATCH_SIZE', int(os.getenv('STREAM_BATCH_SIZE', 500)))
+    app.config.setdefault('FAVORITES_BATCH_LIMIT', int(os.getenv('FAVORITES_BATCH_LIMIT', 500)))
+    app.config.setdefault('QUERY_COUNT_HEADER', os.getenv('QUERY_COUNT_HEADER', '0') == '1')
+    app.config.setdefault('POPULAR_CACHE_TTL', int(os.getenv('POPULAR_CACHE_TTL', 30)))
+    # Workers solo API: sin Flask-Admin ni /spec (tampoco se importan)
+    app.config.setdefault('ADMIN_ENABLED', os.getenv('ADMIN_ENABLED', '1') == '1')
+    app.config.setdefault('SWAGGER_ENABLED', os.getenv('SWAGGER_ENABLED', '1') == '1')
+
+    db.init_app(app)
+    # Flask-Migrate (y alembic) solo hace falta en la CLI: `flask db ...`
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    CORS(app, expose_headers=['Link', 'X-Next-Cursor'])
+    if app.config['ADMIN_ENABLED']:
+        setup_admin(app)
+    if app.config['SWAGGER_ENABLED']:
+        setup_spec(app)
+    setup_instrumentation(app)
+    setup_compression(app)
+    setup_profiler(app)
+    setup_cache(app)
+    setup_commands(app)
+    setup_pool_stats(app)
+    setup_favorites_queue(app)
+    setup_includes(app)
+    setup_snapshot(app)
+    app.register_blueprint(api)
+    return app
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
+def bulk_records():
+    # Array JSON o NDJSON en el cuerpo de la peticion
+    try:
+        records = request.get_json() if request.is_json else load_records(request.get_data(as_text=True))
+    except ValueError:
+        raise APIException('Body must be a JSON array or NDJSON', status_code=400)
+    if not isinstance(records, list):
+        raise APIException('Body must be a JSON array or NDJSON', status_code=400)
+    return records
+
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
 # Rutas para los usuarios:
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
 def get_all_users():
-    users = User.query.all()
-    return jsonify([user.serialize() for user in users]), 200
-
-@app.route('/users/<int:user_id>', methods=['GET'])
+    query, serialize = sparse_query(User)
+    fmt = stream_format()
+    if fmt:
+        return stream_rows(query, User.id, serialize, fmt)
+    users, next_cursor = paginate(query, User.id)
+    return paginated_response([serialize(user) for user in users], next_cursor), 200
+
+@api.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     return jsonify(user.serialize()), 200
 
-@app.route('/users', methods=['POST'])
+@api.route('/users', methods=['POST'])
 def create_user():
-    data = request.get_json()
-    email = data.get('email')
-    password = data.get('password')
-
-    # Verifica si el usuario ya existe
-    user = User.query.filter_by(email=email).first()
-    if user:
+    values = user_values(request.get_json())
+    if values is None:
+        return jsonify({'error': 'email and password are required'}), 400
+
+    # Un solo INSERT atomico: el id lo asigna la secuencia y el email unico resuelve las carreras
+    result = db.session.execute(insert_ignore(User, ['email']).values(**values))
+    if not inserted(result):
+        db.session.rollback()
         return jsonify({'error': 'User already exists'}), 400
-
-    # Crea un nuevo usuario
-    user = User(id=User.query.count() + 1, email=email, password=password, is_active=True)
-    db.session.add(user)
     db.session.commit()
-    return jsonify(user.serialize()), 201
 
-@app.route('/users/<int:user_id>', methods=['PUT'])
+    return jsonify(created_user(result.inserted_primary_key[0], values).serialize()), 201
+
+@api.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     user = User.query.get(user_id)
     if not user:
@@ -78,7 +139,7 @@ def update_user(user_id):
     db.session.commit()
     return jsonify(user.serialize()), 200
 
-@app.route('/users/<int:user_id>', methods=['DELETE'])
+@api.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get(user_id)
     if not user:
@@ -87,61 +148,93 @@ def delete_user(user_id):
     db.session.commit()
     return jsonify({'message': 'User deleted'}), 200
 
-@app.route('/users/<int:user_id>/favorites', methods=['GET'])
+@api.route('/users/<int:user_id>/favorites', methods=['GET'])
 def get_user_favorites(user_id):
-    user = User.query.get(user_id)
+    expand = favorites_expand(request.args)
+    user = User.query.options(*favorites_options(expand)).get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    return jsonify([favorite.serialize() for favorite in user.favorites]), 200
+    favorites = [favorite.serialize(expand) for favorite in user.favorites]
+    writer = favorites_queue()
+    if writer is not None:
+        favorites = writer.overlay(user_id, favorites, expand)
+    return jsonify(favorites), 200
 
 # Rutas para People:
 
-@app.route('/people', methods=['GET'])
+@api.route('/people', methods=['GET'])
+@cached('people')
 def get_all_people():
-    people = People.query.all()
-    return jsonify([person.serialize() for person in people]), 200
-
-@app.route('/people/<int:people_id>', methods=['GET'])
+    query, serialize = sparse_query(People)
+    query, sort = PEOPLE_FILTERS.apply(query)
+    fmt = stream_format()
+    if fmt:
+        return stream_rows(query, People.id, serialize, fmt, sort)
+
+    # Validador barato de la lista: filas, id mas alto y ultima edicion, sin serializar
+    count, last_id, last_edited = db.session.query(
+        func.count(People.id), func.max(People.id), func.max(Person.edited_at)
+    ).outerjoin(People.person).one()
+    etag = make_etag('people', count, last_id, last_edited, request.full_path)
+
+    def build():
+        people, next_cursor = paginate(query, People.id, sort)
+        return paginated_response([serialize(person) for person in people], next_cursor)
+    return conditional_response(build, etag, last_edited)
+
+@api.route('/people/popular', methods=['GET'])
+@cached('popular-people', ttl='POPULAR_CACHE_TTL')
+def get_popular_people():
+    return jsonify(popular_items(People)), 200
+
+@api.route('/people/stats', methods=['GET'])
+@cached('people')
+def get_people_stats():
+    return jsonify(catalogue_stats(Person, ['gender', 'homeworld'])), 200
+
+@api.route('/people/<int:people_id>', methods=['GET'])
+@cached('people', item_arg='people_id', related=('people', 'planets'))
 def get_person(people_id):
-    people = People.query.get(people_id)
+    # Resumen y detalle completo desde Person en una sola consulta
+    fields = requested_fields(Person)
+    include = include_tree(Person)
+    loader = joinedload(People.person)
+    if fields:
+        loader = loader.options(load_fields(Person, fields + ('edited_at',) + tuple(include)))
+    people = People.query.options(loader).get(people_id)
     if not people:
         return jsonify({'error': 'Person not found'}), 404
     
-    # Recuperar detalles completos desde Person
-    person = Person.query.get(people.person_id)
+    person = people.person
     if not person:
         return jsonify({'error': 'Detailed Person not found'}), 404
     
-    return jsonify(person.serialize()), 200
+    if include:
+        # ?include=homeworld: el planeta (y sus residentes) en la misma respuesta
+        return include_response(person, fields, include, 'person', person.id, person.edited_at.isoformat(), fields)
+
+    etag = make_etag('person', person.id, person.edited_at.isoformat(), fields)
+    return conditional_response(lambda: jsonify(person.serialize(fields)), etag, person.edited_at)
 
-@app.route('/people', methods=['POST'])
+@api.route('/people', methods=['POST'])
 def create_person():
     data = request.get_json()
     
-    # Crear en Person (tabla detallada)
+    # Crear en Person; People (tabla resumida) se sincroniza en el mismo flush
     person = Person(**data)
     db.session.add(person)
     db.session.commit()
-
-    # Crear o actualizar en People (tabla resumida)
-    people_data = {
-        'name': person.name,
-        'url': person.url,
-        'person_id': person.id
-    }
-    people = People.query.filter_by(person_id=person.id).first()
-    if not people:
-        people = People(**people_data)
-    else:
-        for key, value in people_data.items():
-            setattr(people, key, value)
-    
-    db.session.add(people)
-    db.session.commit()
+    invalidate('people', person.people.id)
     
     return jsonify(person.serialize()), 201
 
-@app.route('/people/<int:people_id>', methods=['PUT'])
+@api.route('/people/bulk', methods=['POST'])
+def bulk_create_people():
+    report = import_people(bulk_records())
+    invalidate_all('people')
+    return jsonify(report), 200
+
+@api.route('/people/<int:people_id>', methods=['PUT'])
 def update_person(people_id):
     person = Person.query.get(people_id)
     if not person:
@@ -150,78 +243,104 @@ def update_person(people_id):
     data = request.get_json()
     for key, value in data.items():
         setattr(person, key, value)
+    person.edited_at = datetime.now()
     db.session.commit()
-
-    # Actualizar People (tabla resumida)
     if person.people:
-        person.people.name = person.name
-        person.people.url = person.url
-        db.session.commit()
+        invalidate('people', person.people.id)
     
     return jsonify(person.serialize()), 200
 
-@app.route('/people/<int:people_id>', methods=['DELETE'])
+@api.route('/people/<int:people_id>', methods=['DELETE'])
 def delete_person(people_id):
     person = Person.query.get(people_id)
     if not person:
         return jsonify({'error': 'Person not found'}), 404
     
     # Eliminar People asociado
+    people_id = person.people.id if person.people else None
     if person.people:
         db.session.delete(person.people)
     
     db.session.delete(person)
     db.session.commit()
+    invalidate('people', people_id)
     return jsonify({'message': 'Person deleted'}), 200
 
 # Rutas para planetas:
 
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
+@cached('planets')
 def get_all_planets():
-    planets = Planets.query.all()
-    return jsonify([planet.serialize() for planet in planets]), 200
-
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+    query, serialize = sparse_query(Planets)
+    query, sort = PLANET_FILTERS.apply(query)
+    fmt = stream_format()
+    if fmt:
+        return stream_rows(query, Planets.id, serialize, fmt, sort)
+
+    # Validador barato de la lista: filas, id mas alto y ultima edicion, sin serializar
+    count, last_id, last_edited = db.session.query(
+        func.count(Planets.id), func.max(Planets.id), func.max(Planet.edited_at)
+    ).outerjoin(Planets.planet).one()
+    etag = make_etag('planets', count, last_id, last_edited, request.full_path)
+
+    def build():
+        planets, next_cursor = paginate(query, Planets.id, sort)
+        return paginated_response([serialize(planet) for planet in planets], next_cursor)
+    return conditional_response(build, etag, last_edited)
+
+@api.route('/planets/popular', methods=['GET'])
+@cached('popular-planets', ttl='POPULAR_CACHE_TTL')
+def get_popular_planets():
+    return jsonify(popular_items(Planets)), 200
+
+@api.route('/planets/stats', methods=['GET'])
+@cached('planets')
+def get_planets_stats():
+    return jsonify(catalogue_stats(Planet, ['climate', 'terrain'])), 200
+
+@api.route('/planets/<int:planet_id>', methods=['GET'])
+@cached('planets', item_arg='planet_id', related=('people', 'planets'))
 def get_planet(planet_id):
-    planets = Planets.query.get(planet_id)
+    # Resumen y detalle completo desde Planet en una sola consulta
+    fields = requested_fields(Planet)
+    include = include_tree(Planet)
+    loader = joinedload(Planets.planet)
+    if fields:
+        loader = loader.options(load_fields(Planet, fields + ('edited_at',) + tuple(include)))
+    planets = Planets.query.options(loader).get(planet_id)
     if not planets:
         return jsonify({'error': 'Planet not found'}), 404
     
-    # Recuperar detalles completos desde Planet
-    planet = Planet.query.get(planets.planet_id)
+    planet = planets.planet
     if not planet:
         return jsonify({'error': 'Detailed Planet not found'}), 404
     
-    return jsonify(planet.serialize()), 200
+    if include:
+        # ?include=residents: las personas (y su planeta) en la misma respuesta
+        return include_response(planet, fields, include, 'planet', planet.id, planet.edited_at.isoformat(), fields)
 
-@app.route('/planets', methods=['POST'])
+    etag = make_etag('planet', planet.id, planet.edited_at.isoformat(), fields)
+    return conditional_response(lambda: jsonify(planet.serialize(fields)), etag, planet.edited_at)
+
+@api.route('/planets', methods=['POST'])
 def create_planet():
     data = request.get_json()
     
-    # Crear en Planet (tabla detallada)
+    # Crear en Planet; Planets (tabla resumida) se sincroniza en el mismo flush
     planet = Planet(**data)
     db.session.add(planet)
     db.session.commit()
-
-    # Crear o actualizar en Planets (tabla resumida)
-    planets_data = {
-        'name': planet.name,
-        'url': planet.url,
-        'planet_id': planet.id
-    }
-    planets = Planets.query.filter_by(planet_id=planet.id).first()
-    if not planets:
-        planets = Planets(**planets_data)
-    else:
-        for key, value in planets_data.items():
-            setattr(planets, key, value)
-    
-    db.session.add(planets)
-    db.session.commit()
+    invalidate('planets', planet.planets.id)
     
     return jsonify(planet.serialize()), 201
 
-@app.route('/planets/<int:planet_id>', methods=['PUT'])
+@api.route('/planets/bulk', methods=['POST'])
+def bulk_create_planets():
+    report = import_planets(bulk_records())
+    invalidate_all('planets')
+    return jsonify(report), 200
+
+@api.route('/planets/<int:planet_id>', methods=['PUT'])
 def update_planet(planet_id):
     planet = Planet.query.get(planet_id)
     if not planet:
@@ -230,42 +349,50 @@ def update_planet(planet_id):
     data = request.get_json()
     for key, value in data.items():
         setattr(planet, key, value)
+    planet.edited_at = datetime.now()
     db.session.commit()
-
-    # Actualizar Planets (tabla resumida)
     if planet.planets:
-        planet.planets.name = planet.name
-        planet.planets.url = planet.url
-        db.session.commit()
+        invalidate('planets', planet.planets.id)
     
     return jsonify(planet.serialize()), 200
 
-@app.route('/planets/<int:planet_id>', methods=['DELETE'])
+@api.route('/planets/<int:planet_id>', methods=['DELETE'])
 def delete_planet(planet_id):
     planet = Planet.query.get(planet_id)
     if not planet:
         return jsonify({'error': 'Planet not found'}), 404
     
     # Eliminar Planets asociado
+    planets_id = planet.planets.id if planet.planets else None
     if planet.planets:
         db.session.delete(planet.planets)
     
     db.session.delete(planet)
     db.session.commit()
+    invalidate('planets', planets_id)
     return jsonify({'message': 'Planet deleted'}), 200
 
 # Rutas para favoritos:
 
-@app.route('/favorites', methods=['GET'])
+@api.route('/favorites', methods=['GET'])
 def get_all_favorites():
-    favorites = Favorite.query.all()
-    return jsonify([favorite.serialize() for favorite in favorites]), 200
-
-@app.route('/favorite/planet/<int:planet_id>', methods=['POST'])
+    query, serialize = sparse_query(Favorite)
+    fmt = stream_format()
+    if fmt:
+        return stream_rows(query, Favorite.id, serialize, fmt)
+    favorites, next_cursor = paginate(query, Favorite.id)
+    return paginated_response([serialize(favorite) for favorite in favorites], next_cursor), 200
+
+@api.route('/favorite/planet/<int:planet_id>', methods=['POST'])
 def create_planet_favorite(planet_id):
     data = request.get_json()
     user_id = data.get('user_id')
 
+    # Modo write-behind: se valida en memoria, se encola y se responde 202
+    writer = favorites_queue()
+    if writer is not None:
+        return writer.submit('add', 'planet', user_id, planet_id)
+
     # Verifica si el usuario y el planeta existen
     user = User.query.get(user_id)
     if not user:
@@ -278,14 +405,25 @@ def create_planet_favorite(planet_id):
     # Crea un nuevo favorito
     favorite = Favorite(user_id=user.id, planet_id=planet.id)
     db.session.add(favorite)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Ya era favorito: los reintentos del cliente son idempotentes
+        db.session.rollback()
+        favorite = Favorite.query.filter_by(user_id=user_id, planet_id=planet_id).first()
+        return jsonify(favorite.serialize()), 200
     return jsonify(favorite.serialize()), 201
 
-@app.route('/favorite/people/<int:people_id>', methods=['POST'])
+@api.route('/favorite/people/<int:people_id>', methods=['POST'])
 def create_people_favorite(people_id):
     data = request.get_json()
     user_id = data.get('user_id')
 
+    # Modo write-behind: se valida en memoria, se encola y se responde 202
+    writer = favorites_queue()
+    if writer is not None:
+        return writer.submit('add', 'people', user_id, people_id)
+
     # Verifica si el usuario y la persona existen
     user = User.query.get(user_id)
     if not user:
@@ -298,14 +436,25 @@ def create_people_favorite(people_id):
     # Crea un nuevo favorito
     favorite = Favorite(user_id=user.id, people_id=person.id)
     db.session.add(favorite)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Ya era favorito: los reintentos del cliente son idempotentes
+        db.session.rollback()
+        favorite = Favorite.query.filter_by(user_id=user_id, people_id=people_id).first()
+        return jsonify(favorite.serialize()), 200
     return jsonify(favorite.serialize()), 201
 
-@app.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
+@api.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
 def delete_planet_favorite(planet_id):
     data = request.get_json()
     user_id = data.get('user_id')
 
+    # Modo write-behind: se valida en memoria, se encola y se responde 202
+    writer = favorites_queue()
+    if writer is not None:
+        return writer.submit('remove', 'planet', user_id, planet_id)
+
     # Busca el favorito y elimínalo
     favorite = Favorite.query.filter_by(user_id=user_id, planet_id=planet_id).first()
     if not favorite:
@@ -314,11 +463,16 @@ def delete_planet_favorite(planet_id):
     db.session.commit()
     return jsonify({'message': 'Favorite deleted'}), 200
 
-@app.route('/favorite/people/<int:people_id>', methods=['DELETE'])
+@api.route('/favorite/people/<int:people_id>', methods=['DELETE'])
 def delete_people_favorite(people_id):
     data = request.get_json()
     user_id = data.get('user_id')
 
+    # Modo write-behind: se valida en memoria, se encola y se responde 202
+    writer = favorites_queue()
+    if writer is not None:
+        return writer.submit('remove', 'people', user_id, people_id)
+
     # Busca el favorito y elimínalo
     favorite = Favorite.query.filter_by(user_id=user_id, people_id=people_id).first()
     if not favorite:
@@ -327,7 +481,55 @@ def delete_people_favorite(people_id):
     db.session.commit()
     return jsonify({'message': 'Favorite deleted'}), 200
 
+@api.route('/users/<int:user_id>/favorites/batch', methods=['POST', 'DELETE'])
+def batch_favorites(user_id):
+    data = request.get_json()
+    if not isinstance(data, dict):
+        raise APIException('Body must be an object with planets and people', status_code=400)
+    planet_ids = data.get('planets', [])
+    people_ids = data.get('people', [])
+    # bool es subclase de int: true/false no son ids
+    def valid(ids):
+        return isinstance(ids, list) and all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+    if not (valid(planet_ids) and valid(people_ids)):
+        raise APIException('planets and people must be lists of ids', status_code=400)
+    planet_ids, people_ids = sorted(set(planet_ids)), sorted(set(people_ids))
+    if len(planet_ids) + len(people_ids) > current_app.config['FAVORITES_BATCH_LIMIT']:
+        raise APIException('Too many favorites in one batch', status_code=400)
+
+    if db.session.execute(select(User.id).where(User.id == user_id)).scalar() is None:
+        return jsonify({'error': 'User not found'}), 404
+
+    if request.method == 'DELETE':
+        if planet_ids:
+            db.session.execute(delete(Favorite).where(Favorite.user_id == user_id, Favorite.planet_id.in_(planet_ids)))
+        if people_ids:
+            db.session.execute(delete(Favorite).where(Favorite.user_id == user_id, Favorite.people_id.in_(people_ids)))
+        for statement in favorite_recounts([user_id], planet_ids, people_ids):
+            db.session.execute(statement)
+        db.session.commit()
+        return jsonify({'message': 'Favorites deleted', 'planets': planet_ids, 'people': people_ids}), 200
+
+    # Una consulta IN por tipo para validar que existen
+    for model, ids, label in ((Planets, planet_ids, 'Planets'), (People, people_ids, 'People')):
+        found = set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars()) if ids else set()
+        missing = sorted(set(ids) - found)
+        if missing:
+            return jsonify({'error': f'{label} not found', 'ids': missing}), 404
+
+    if planet_ids:
+        rows = [{'user_id': user_id, 'planet_id': planet_id, 'people_id': None} for planet_id in planet_ids]
+        db.session.execute(insert_ignore(Favorite, ['user_id', 'planet_id']), rows)
+    if people_ids:
+        rows = [{'user_id': user_id, 'planet_id': None, 'people_id': people_id} for people_id in people_ids]
+        db.session.execute(insert_ignore(Favorite, ['user_id', 'people_id']), rows)
+    if planet_ids or people_ids:
+        for statement in favorite_recounts([user_id], planet_ids, people_ids):
+            db.session.execute(statement)
+    db.session.commit()
+    return jsonify({'message': 'Favorites added', 'planets': planet_ids, 'people': people_ids}), 200
+
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
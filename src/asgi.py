@@ -0,0 +1,266 @@
+"""
+ASGI entry point: the user, people, planet and favorite endpoints served with async
+SQLAlchemy sessions, so a slow query waits on the event loop instead of pinning a worker.
+
+    $ pipenv run uvicorn asgi:app --app-dir src --workers 2
+
+Needs uvicorn and an async driver (asyncpg for Postgres, aiosqlite for SQLite). The
+WSGI app (app.py / wsgi.py) is unchanged and keeps serving everything, including what
+is not ported here: admin, bulk imports, catalogue writes, filters, stats and caching.
+"""
+import json
+import os
+import re
+from urllib.parse import parse_qsl, urlencode
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from models import insert_ignore, inserted, favorite_recounts, user_values, created_user, favorites_expand, favorites_options, User, People, Planets, Favorite, Person, Planet
+from pool import async_database_uri, async_engine_options
+from utils import APIException, encode_cursor, decode_cursor, load_fields, parse_fields, parse_page_size
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+db_url = os.getenv("DATABASE_URL")
+if db_url is not None:
+    DATABASE_URI = db_url.replace("postgres://", "postgresql://")
+else:
+    DATABASE_URI = "sqlite:////tmp/test.db"
+# Los mismos valores que app.config en la app WSGI
+CONFIG = {
+    'PAGE_SIZE': int(os.getenv('PAGE_SIZE', 50)),
+    'MAX_PAGE_SIZE': int(os.getenv('MAX_PAGE_SIZE', 200)),
+}
+
+engine = create_async_engine(async_database_uri(DATABASE_URI), **async_engine_options(DATABASE_URI))
+Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = dict(parse_qsl(scope['query_string'].decode()))
+        self.headers = {key.decode().lower(): value.decode() for key, value in scope['headers']}
+        self.scheme = scope.get('scheme', 'http')
+        self.body = body
+
+    def get_json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            raise APIException('Body must be JSON', status_code=400)
+
+    def url(self, **args):
+        query = urlencode(dict(self.args, **args))
+        return f"{self.scheme}://{self.headers.get('host', 'localhost')}{self.path}?{query}"
+
+ROUTES = []
+
+def route(method, pattern):
+    regex = re.compile('^' + re.sub(r'<int:(\w+)>', r'(?P<\1>[0-9]+)', pattern) + '/?$')
+
+    def decorator(handler):
+        ROUTES.append((method, regex, handler))
+        return handler
+    return decorator
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+async def paginated_list(session, request, model):
+    # Paginacion por cursor, igual que utils.paginate
+    fields = parse_fields(request.args, model)
+    query = select(model)
+    if fields:
+        query = query.options(load_fields(model, fields))
+    limit = parse_page_size(request.args, CONFIG)
+    after = decode_cursor(request.args.get('after'))
+    if after is not None:
+        query = query.where(model.id > after[-1])
+    rows = (await session.execute(query.order_by(model.id).limit(limit + 1))).scalars().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].id])
+        headers['Link'] = f'<{request.url(after=next_cursor)}>; rel="next"'
+        headers['X-Next-Cursor'] = next_cursor
+    serialize = model.serializer(fields)
+    return [serialize(row) for row in rows], 200, headers
+
+# Rutas para los usuarios:
+
+@route('GET', '/users')
+async def get_all_users(session, request):
+    return await paginated_list(session, request, User)
+
+@route('GET', '/users/<int:user_id>')
+async def get_user(session, request, user_id):
+    user = await session.get(User, user_id)
+    if not user:
+        return {'error': 'User not found'}, 404
+    return user.serialize(), 200
+
+@route('POST', '/users')
+async def create_user(session, request):
+    values = user_values(request.get_json())
+    if values is None:
+        return {'error': 'email and password are required'}, 400
+
+    result = await session.execute(insert_ignore(User, ['email'], engine.dialect.name).values(**values))
+    if not inserted(result, engine.dialect.name):
+        await session.rollback()
+        return {'error': 'User already exists'}, 400
+    await session.commit()
+    return created_user(result.inserted_primary_key[0], values).serialize(), 201
+
+@route('GET', '/users/<int:user_id>/favorites')
+async def get_user_favorites(session, request, user_id):
+    expand = favorites_expand(request.args)
+    user = await session.get(User, user_id, options=favorites_options(expand))
+    if not user:
+        return {'error': 'User not found'}, 404
+    return [favorite.serialize(expand) for favorite in user.favorites], 200
+
+# Rutas para People y Planets:
+
+@route('GET', '/people')
+async def get_all_people(session, request):
+    return await paginated_list(session, request, People)
+
+@route('GET', '/planets')
+async def get_all_planets(session, request):
+    return await paginated_list(session, request, Planets)
+
+async def get_detail(session, request, summary, relationship, detail, summary_id, label):
+    fields = parse_fields(request.args, detail)
+    loader = joinedload(relationship)
+    if fields:
+        loader = loader.options(load_fields(detail, fields))
+    row = await session.get(summary, summary_id, options=[loader])
+    if not row:
+        return {'error': f'{label} not found'}, 404
+    item = getattr(row, relationship.key)
+    if not item:
+        return {'error': f'Detailed {label} not found'}, 404
+    return item.serialize(fields), 200
+
+@route('GET', '/people/<int:people_id>')
+async def get_person(session, request, people_id):
+    return await get_detail(session, request, People, People.person, Person, people_id, 'Person')
+
+@route('GET', '/planets/<int:planet_id>')
+async def get_planet(session, request, planet_id):
+    return await get_detail(session, request, Planets, Planets.planet, Planet, planet_id, 'Planet')
+
+# Rutas para los favoritos:
+
+@route('GET', '/favorites')
+async def get_all_favorites(session, request):
+    return await paginated_list(session, request, Favorite)
+
+async def recount(session, user_id, column, target_id):
+    # Core INSERT/DELETE no pasa por los eventos del ORM: se recuentan los contadores
+    targets = {'planet_ids': [target_id]} if column is Favorite.planet_id else {'people_ids': [target_id]}
+    for statement in favorite_recounts([user_id], **targets):
+        await session.execute(statement)
+
+async def create_favorite(session, request, model, column, target_id, label):
+    user_id = (request.get_json() or {}).get('user_id')
+    if await session.scalar(select(User.id).where(User.id == user_id)) is None:
+        return {'error': 'User not found'}, 404
+    if await session.scalar(select(model.id).where(model.id == target_id)) is None:
+        return {'error': f'{label} not found'}, 404
+
+    # Ya era favorito: los reintentos del cliente son idempotentes
+    values = {'user_id': user_id, 'planet_id': None, 'people_id': None, column.key: target_id}
+    result = await session.execute(insert_ignore(Favorite, ['user_id', column.key], engine.dialect.name).values(**values))
+    created = inserted(result, engine.dialect.name)
+    if created:
+        await recount(session, user_id, column, target_id)
+    await session.commit()
+    favorite = await session.scalar(select(Favorite).where(Favorite.user_id == user_id, column == target_id))
+    return favorite.serialize(), 201 if created else 200
+
+async def delete_favorite(session, request, column, target_id):
+    user_id = (request.get_json() or {}).get('user_id')
+    result = await session.execute(delete(Favorite).where(Favorite.user_id == user_id, column == target_id))
+    if result.rowcount == 0:
+        await session.rollback()
+        return {'error': 'Favorite not found'}, 404
+    await recount(session, user_id, column, target_id)
+    await session.commit()
+    return {'message': 'Favorite deleted'}, 200
+
+@route('POST', '/favorite/planet/<int:planet_id>')
+async def create_planet_favorite(session, request, planet_id):
+    return await create_favorite(session, request, Planets, Favorite.planet_id, planet_id, 'Planet')
+
+@route('POST', '/favorite/people/<int:people_id>')
+async def create_people_favorite(session, request, people_id):
+    return await create_favorite(session, request, People, Favorite.people_id, people_id, 'People')
+
+@route('DELETE', '/favorite/planet/<int:planet_id>')
+async def delete_planet_favorite(session, request, planet_id):
+    return await delete_favorite(session, request, Favorite.planet_id, planet_id)
+
+@route('DELETE', '/favorite/people/<int:people_id>')
+async def delete_people_favorite(session, request, people_id):
+    return await delete_favorite(session, request, Favorite.people_id, people_id)
+
+async def dispatch(request):
+    allowed = False
+    for method, regex, handler in ROUTES:
+        match = regex.match(request.path)
+        if not match:
+            continue
+        if method != request.method:
+            allowed = True
+            continue
+        params = {key: int(value) for key, value in match.groupdict().items()}
+        async with Session() as session:
+            try:
+                result = await handler(session, request, **params)
+            except APIException as error:
+                return error.to_dict(), error.status_code, {}
+        return result if len(result) == 3 else (*result, {})
+    if allowed:
+        return {'error': 'Method not allowed'}, 405, {}
+    return {'error': 'Not found'}, 404, {}
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    request = Request(scope, await read_body(receive))
+    data, status, headers = await dispatch(request)
+    body = dumps(data)
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + [
+        (key.lower().encode(), value.encode()) for key, value in headers.items()
+    ]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
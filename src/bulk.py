@@ -0,0 +1,125 @@
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, String, select
+from models import db, numeric_shadows, replace_refs, upsert, StringList, People, Person, Planets, Planet
+
+BATCH_SIZE = 1000
+
+def load_records(text):
+    # Acepta un array JSON o NDJSON (un objeto por linea)
+    text = text.strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def _validate(model, record, now):
+    if not isinstance(record, dict):
+        raise ValueError('record must be an object')
+    values = {}
+    shadows = set(model.__numeric_shadows__.values())
+    for column in model.__table__.columns:
+        if column.primary_key or column.name in shadows:
+            continue
+        value = record.get(column.name)
+        if column.name == 'edited_at':
+            # Hora del servidor aunque venga en el registro: el ETag de las listas usa max(edited_at)
+            values[column.name] = now
+            continue
+        if isinstance(column.type, DateTime):
+            values[column.name] = datetime.fromisoformat(value) if value else now
+            continue
+        if value is None:
+            raise ValueError(f'{column.name} is required')
+        if isinstance(column.type, StringList):
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f'{column.name} must be a list of strings')
+        elif isinstance(column.type, String):
+            if not isinstance(value, str):
+                raise ValueError(f'{column.name} must be a string')
+            if column.type.length and len(value) > column.type.length:
+                raise ValueError(f'{column.name} is longer than {column.type.length} characters')
+        values[column.name] = value
+    values.update(numeric_shadows(model, values))
+    return values
+
+class BulkImporter:
+    """Upserts detail rows (Person/Planet), their list references and their summary rows by url.
+
+    Detail and summary rows are written with INSERT ... ON CONFLICT (url) on their unique url
+    indexes, so concurrent imports of the same url update one row. Every batch is written
+    with executemany statements and the whole import runs in a single transaction; invalid
+    rows, and urls repeated within the import, are skipped and reported with their index.
+    """
+
+    def __init__(self, detail, summary, fk_name):
+        self.detail = detail
+        self.summary = summary
+        self.fk_name = fk_name
+
+    def run(self, records):
+        report = {'inserted': 0, 'updated': 0, 'errors': []}
+        now = datetime.now()
+        try:
+            for offset in range(0, len(records), BATCH_SIZE):
+                self._import_batch(records[offset:offset + BATCH_SIZE], offset, now, report)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return report
+
+    def _import_batch(self, records, offset, now, report):
+        detail, summary = self.detail.__table__, self.summary.__table__
+
+        rows = {}
+        for index, record in enumerate(records, start=offset):
+            try:
+                values = _validate(self.detail, record, now)
+            except (ValueError, TypeError) as error:
+                report['errors'].append({'index': index, 'error': str(error)})
+                continue
+            if values['url'] in rows:
+                # Se queda el primero: el repetido no lo pisa en silencio
+                first = rows[values['url']][0]
+                report['errors'].append({'index': index, 'error': f"url {values['url']!r} already in this import at index {first}"})
+                continue
+            rows[values['url']] = (index, values)
+
+        # El nombre del resumen es unico: no puede pertenecer a otra url
+        owners = dict(db.session.execute(
+            select(summary.c.name, summary.c.url).where(summary.c.name.in_([values['name'] for _, values in rows.values()]))
+        ).all())
+        seen_names = {}
+        for url, (index, values) in list(rows.items()):
+            owner = owners.get(values['name'], seen_names.get(values['name'], url))
+            if owner != url:
+                report['errors'].append({'index': index, 'error': f"name {values['name']!r} already used by {owner}"})
+                del rows[url]
+            else:
+                seen_names[values['name']] = url
+        if not rows:
+            return
+
+        # Solo para el informe; la escritura es un upsert sobre el indice unico de url
+        existing = set(db.session.execute(
+            select(detail.c.url).where(detail.c.url.in_(list(rows)))
+        ).scalars())
+        # Como en update_person: al actualizar, edited_at tambien es la hora de la importacion
+        columns = [name for name in next(iter(rows.values()))[1] if name not in ('url', 'created_at', 'edited_at')]
+        db.session.execute(upsert(self.detail, ['url'], columns, edited_at=now), [values for _, values in rows.values()])
+        report['inserted'] += len(rows) - len(existing)
+        report['updated'] += len(existing)
+
+        ids = dict(db.session.execute(
+            select(detail.c.url, detail.c.id).where(detail.c.url.in_(list(rows)))
+        ).all())
+        replace_refs(db.session, self.detail, [(ids[url], values) for url, (_, values) in rows.items()])
+
+        summaries = [{'name': values['name'], 'url': url, self.fk_name: ids[url]} for url, (_, values) in rows.items()]
+        db.session.execute(upsert(self.summary, ['url'], ['name', self.fk_name]), summaries)
+
+def import_people(records):
+    return BulkImporter(Person, People, 'person_id').run(records)
+
+def import_planets(records):
+    return BulkImporter(Planet, Planets, 'planet_id').run(records)
@@ -0,0 +1,236 @@
+import fcntl
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request, Response
+from utils import stream_format
+from compression import compressible, negotiate, precompress, set_encoding
+
+class CounterFile:
+    """Generation counters in a memory-mapped file shared by every worker of the host.
+
+    Keys are hashed into a fixed number of uint64 slots, so the file never grows; two
+    keys sharing a slot only invalidate each other more often than needed.
+    """
+
+    SLOT = struct.Struct('<Q')
+
+    def __init__(self, path, slots=65536):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        size = slots * self.SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _offset(self, key):
+        return (zlib.crc32(key.encode()) % self.slots) * self.SLOT.size
+
+    def get(self, key):
+        return self.SLOT.unpack_from(self._map, self._offset(key))[0]
+
+    def incr(self, key):
+        offset = self._offset(key)
+        # flock serializa entre procesos, el Lock entre hilos del mismo proceso
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                self.SLOT.pack_into(self._map, offset, self.SLOT.unpack_from(self._map, offset)[0] + 1)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+class LRUBackend:
+    """In-process LRU cache with a per-entry TTL (one instance per worker).
+
+    The entries are private to the worker but the generation counters live in a
+    CounterFile, so a write in any worker of the host invalidates every worker's pages.
+    Several hosts still need the shared backend.
+    """
+
+    def __init__(self, counters, max_entries=1024):
+        self.max_entries = max_entries
+        self.counters = counters
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        return self.counters.get(key)
+
+    def incr(self, key):
+        self.counters.incr(key)
+
+    def size(self):
+        return len(self._entries)
+
+class SharedBackend:
+    """Cache shared by every worker, on top of a redis-like client (get/set/incr)."""
+
+    def __init__(self, client, prefix='swapi:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        self.client.incr(self.prefix + key)
+
+    def size(self):
+        return None
+
+class ResponseCache:
+    """Read-through cache of GET responses keyed by route and query string.
+
+    Each namespace has a generation counter for its list pages and one per item for
+    detail pages; invalidating bumps the counters so stale keys are never read again
+    and simply age out of the backend.
+    """
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, namespace, item_id=None, related=()):
+        if item_id is None:
+            generation = self.backend.counter(f'gen:{namespace}')
+            return f'{namespace}:list:{generation}:{request.full_path}'
+        generation = self.backend.counter(f'gen:{namespace}:{item_id}')
+        epoch = self.backend.counter(f'gen:{namespace}:*')
+        key = f'{namespace}:item:{item_id}:{epoch}.{generation}:{request.full_path}'
+        if related:
+            # Respuestas que incluyen filas de otros namespaces (?include=)
+            key += ':' + '.'.join(str(self.backend.counter(f'gen:{other}')) for other in related)
+        return key
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.ttl)
+
+    def invalidate(self, namespace, item_id=None):
+        self.backend.incr(f'gen:{namespace}')
+        if item_id is not None:
+            self.backend.incr(f'gen:{namespace}:{item_id}')
+
+    def invalidate_all(self, namespace):
+        self.backend.incr(f'gen:{namespace}')
+        self.backend.incr(f'gen:{namespace}:*')
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+def cached(namespace, item_arg=None, ttl=None, related=()):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or stream_format():
+                return view(*args, **kwargs)
+
+            depends = related if request.args.get('include') else ()
+            key = cache.key(namespace, kwargs.get(item_arg) if item_arg else None, depends)
+            entry = cache.get(key)
+            if entry is not None:
+                # Entradas anteriores a la compresion: (cuerpo, cabeceras)
+                body, headers, encoded = entry if len(entry) == 3 else (*entry, {})
+                response = Response(body, status=200, headers=headers)
+                encoding = negotiate(len(body)) if encoded else None
+                if encoding in encoded:
+                    # Ya comprimido al guardarlo: no se recomprime en cada acierto
+                    set_encoding(response, encoding, encoded[encoding])
+                response.headers['X-Cache'] = 'HIT'
+                return response.make_conditional(request)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                body = response.get_data()
+                encoded = precompress(body) if compressible(response) else {}
+                # ttl puede ser el nombre de un valor de app.config
+                cache.set(key, (body, list(response.headers.items()), encoded),
+                          current_app.config[ttl] if isinstance(ttl, str) else ttl)
+                encoding = negotiate(len(body)) if encoded else None
+                if encoding in encoded:
+                    set_encoding(response, encoding, encoded[encoding])
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+def invalidate(namespace, item_id=None):
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(namespace, item_id)
+
+def invalidate_all(namespace):
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate_all(namespace)
+
+def setup_cache(app):
+    app.config.setdefault('CACHE_TYPE', os.getenv('CACHE_TYPE', 'lru'))
+    app.config.setdefault('CACHE_TTL', int(os.getenv('CACHE_TTL', 60)))
+    app.config.setdefault('CACHE_MAX_ENTRIES', int(os.getenv('CACHE_MAX_ENTRIES', 1024)))
+    app.config.setdefault('CACHE_REDIS_URL', os.getenv('CACHE_REDIS_URL'))
+    app.config.setdefault('CACHE_COUNTERS_FILE', os.getenv('CACHE_COUNTERS_FILE', '/tmp/swapi-cache-counters'))
+
+    cache_type = app.config['CACHE_TYPE']
+    if cache_type == 'none':
+        return
+    if cache_type == 'redis':
+        import redis
+        backend = SharedBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+    else:
+        backend = LRUBackend(CounterFile(app.config['CACHE_COUNTERS_FILE']), app.config['CACHE_MAX_ENTRIES'])
+    app.extensions['response_cache'] = ResponseCache(backend, app.config['CACHE_TTL'])
+
+    @app.route('/internal/cache', methods=['GET'])
+    def cache_stats():
+        return jsonify(app.extensions['response_cache'].stats()), 200
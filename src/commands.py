@@ -0,0 +1,32 @@
+import click
+from flask import current_app
+from bulk import load_records, import_people, import_planets
+from snapshot import build_snapshot
+
+def _echo_report(report):
+    click.echo(f"{report['inserted']} inserted, {report['updated']} updated, {len(report['errors'])} errors")
+    for error in report['errors']:
+        click.echo(f"  row {error['index']}: {error['error']}", err=True)
+
+def setup_commands(app):
+
+    @app.cli.command('import-people')
+    @click.argument('source', type=click.File('r'))
+    def import_people_command(source):
+        """Bulk import Person/People records from a JSON array or NDJSON file."""
+        _echo_report(import_people(load_records(source.read())))
+
+    @app.cli.command('import-planets')
+    @click.argument('source', type=click.File('r'))
+    def import_planets_command(source):
+        """Bulk import Planet/Planets records from a JSON array or NDJSON file."""
+        _echo_report(import_planets(load_records(source.read())))
+
+    @app.cli.command('build-snapshot')
+    @click.option('--directory', default=None, help='Defaults to SNAPSHOT_DIR.')
+    def build_snapshot_command(directory):
+        """Compile People/Planets and their details into a new snapshot and make it current."""
+        config = current_app.config
+        path, version, counts = build_snapshot(directory or config['SNAPSHOT_DIR'], keep=config['SNAPSHOT_KEEP'])
+        click.echo(f"snapshot {version}: " + ', '.join(f'{count} {name}' for name, count in counts.items()))
+        click.echo(path)
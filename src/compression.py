@@ -0,0 +1,92 @@
+import os
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/')
+
+def available_encodings():
+    # Por orden de preferencia a igual calidad en Accept-Encoding
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compressible(response):
+    mimetype = response.mimetype or ''
+    return (response.status_code == 200 and 'Content-Encoding' not in response.headers
+            and any(mimetype.startswith(prefix) for prefix in COMPRESSIBLE))
+
+def negotiate(size=None):
+    # Codificacion para esta peticion, o None (cuerpo pequeno o el cliente no la acepta)
+    config = current_app.config
+    if not config['COMPRESS_ENABLED'] or size is not None and size < config['COMPRESS_MIN_SIZE']:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=current_app.config['COMPRESS_BR_QUALITY'])
+    compressor = zlib.compressobj(current_app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+def precompress(body):
+    # Variantes que se guardan junto al cuerpo en la cache de respuestas
+    if not current_app.config['COMPRESS_ENABLED'] or len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return {}
+    return {encoding: compress(body, encoding) for encoding in available_encodings()}
+
+def compress_stream(chunks, encoding):
+    # Cada chunk se vacia (sync flush) para que el cliente lo reciba sin esperar al final
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=current_app.config['COMPRESS_BR_QUALITY'])
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(current_app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+        process, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    def generate():
+        for chunk in chunks:
+            data = process(chunk.encode() if isinstance(chunk, str) else chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    return generate()
+
+def set_encoding(response, encoding, body=None):
+    # Aqui y no solo en compress_response: las respuestas ya codificadas (cache) no pasan por ella
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Otra representacion: el ETag pasa a debil (If-None-Match compara en debil)
+        response.set_etag(etag, weak=True)
+    if body is not None:
+        response.set_data(body)
+    return response
+
+def setup_compression(app):
+    app.config.setdefault('COMPRESS_ENABLED', os.getenv('COMPRESS_ENABLED', '1') == '1')
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', 1024)))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.getenv('COMPRESS_LEVEL', 6)))
+    app.config.setdefault('COMPRESS_BR_QUALITY', int(os.getenv('COMPRESS_BR_QUALITY', 4)))
+
+    @app.after_request
+    def compress_response(response):
+        if not compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.is_streamed:
+            encoding = negotiate()
+            if encoding is not None:
+                response.response = compress_stream(response.response, encoding)
+                response.headers.pop('Content-Length', None)
+                set_encoding(response, encoding)
+            return response
+        if response.direct_passthrough:
+            return response
+        encoding = negotiate(response.content_length)
+        if encoding is not None:
+            set_encoding(response, encoding, compress(response.get_data(), encoding))
+        return response
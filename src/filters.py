@@ -0,0 +1,137 @@
+from flask import request
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+from models import db, People, Person, Planets, Planet
+from utils import APIException
+
+# Parametros de las rutas de lista que no son filtros (_profile es el del profiler)
+RESERVED_ARGS = {'limit', 'after', 'fields', 'stream', 'format', 'include', 'sort', 'q', '_profile'}
+
+class FilterSet:
+    """Turns query-string filters into SQL conditions on a list endpoint.
+
+    field=value         equality
+    field__in=a,b       IN
+    field__prefix=abc   starts with; on Postgres served by the trigram index on name and
+                        the text_pattern_ops indexes on gender, homeworld, climate and
+                        terrain (a scan for the other fields and on SQLite)
+    array__contains=x   list membership, looked up in the person_refs/planet_refs index
+    q=text              case-insensitive substring search on the summary name
+                        (trigram index on Postgres; a full scan on SQLite)
+    sort=field|-field   order by a numeric column, NULLs last
+    """
+
+    def __init__(self, relationship, columns, arrays, search_column, sortable=None):
+        self.relationship = relationship
+        self.foreign_key = next(iter(relationship.property.local_columns))
+        self.columns = columns
+        self.arrays = arrays
+        self.search_column = search_column
+        self.sortable = sortable or {}
+
+    def conditions(self, args):
+        conditions = []
+        needs_join = False
+        for key, value in args.items(multi=True):
+            if key == 'sort':
+                continue
+            name, _, op = key.partition('__')
+            if name == 'q' and not op:
+                if db.engine.dialect.name == 'postgresql':
+                    conditions.append(self.search_column.ilike(f'%{_escape_like(value)}%', escape='\\'))
+                else:
+                    conditions.append(self.search_column.like(f'%{_escape_like(value)}%', escape='\\'))
+                continue
+            if name in self.arrays:
+                if op != 'contains':
+                    raise APIException(f'{name} only supports {name}__contains', status_code=400)
+                # person_id IN (SELECT ... WHERE kind = 'films' AND url = :value): sin JOIN ni escaneo
+                refs = self.arrays[name].class_.__refs__
+                owners = select(refs.owner_id).where(refs.kind == name, refs.url == value)
+                conditions.append(self.foreign_key.in_(owners))
+                continue
+            if name not in self.columns:
+                # Los parametros de paginacion, formato, etc. no son filtros; el resto es un error del cliente
+                if key in RESERVED_ARGS:
+                    continue
+                raise APIException(f'Unknown filter {key}', status_code=400)
+            column = self.columns[name]
+            if op == '':
+                conditions.append(column == value)
+            elif op == 'in':
+                conditions.append(column.in_([item for item in value.split(',') if item]))
+            elif op == 'prefix':
+                # Patron literal 'abc%': el planificador solo usa el indice con un prefijo constante
+                conditions.append(column.like(f'{_escape_like(value)}%', escape='\\'))
+            else:
+                raise APIException(f'Unknown filter {key}', status_code=400)
+            needs_join = needs_join or column.class_ is not self.search_column.class_
+        return conditions, needs_join
+
+    def sort(self, args):
+        sort = args.get('sort')
+        if not sort:
+            return None
+        descending = sort.startswith('-')
+        column = self.sortable.get(sort.lstrip('-'))
+        if column is None:
+            raise APIException(f"sort only accepts {', '.join(sorted(self.sortable))}", status_code=400)
+        detail = self.relationship.key
+        return column, descending, lambda row: getattr(getattr(row, detail), column.key)
+
+    def apply(self, query, args=None):
+        # Devuelve la consulta filtrada y el orden para paginate()
+        args = request.args if args is None else args
+        conditions, needs_join = self.conditions(args)
+        sort = self.sort(args)
+        if needs_join or sort:
+            query = query.join(self.relationship)
+        if sort:
+            query = query.options(contains_eager(self.relationship).load_only(sort[0]))
+        if conditions:
+            query = query.filter(*conditions)
+        return query, sort
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+PEOPLE_FILTERS = FilterSet(
+    People.person,
+    columns={
+        'name': People.name,
+        'gender': Person.gender,
+        'homeworld': Person.homeworld,
+        'birth_year': Person.birth_year,
+        'eye_color': Person.eye_color,
+        'hair_color': Person.hair_color,
+        'skin_color': Person.skin_color,
+    },
+    arrays={
+        'films': Person.films,
+        'species': Person.species,
+        'starships': Person.starships,
+        'vehicles': Person.vehicles,
+    },
+    search_column=People.name,
+    sortable={'height': Person.height_num, 'mass': Person.mass_num},
+)
+
+PLANET_FILTERS = FilterSet(
+    Planets.planet,
+    columns={
+        'name': Planets.name,
+        'climate': Planet.climate,
+        'terrain': Planet.terrain,
+        'gravity': Planet.gravity,
+    },
+    arrays={
+        'films': Planet.films,
+        'residents': Planet.residents,
+    },
+    search_column=Planets.name,
+    sortable={
+        'population': Planet.population_num,
+        'diameter': Planet.diameter_num,
+        'orbital_period': Planet.orbital_period_num,
+    },
+)
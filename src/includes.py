@@ -0,0 +1,109 @@
+import os
+from flask import current_app, jsonify, request
+from sqlalchemy import select
+from models import db, People, Planets, Person, Planet
+from utils import APIException, make_etag, conditional_response
+
+# Columnas con urls que apuntan a filas locales: nombre -> (modelo destino, es lista)
+RELATIONS = {
+    Person: {'homeworld': (Planet, False)},
+    Planet: {'residents': (Person, True)},
+}
+
+# Resumen con la url unica e indexada de cada detalle
+SUMMARIES = {
+    Person: People,
+    Planet: Planets,
+}
+
+def include_tree(model):
+    # ?include=homeworld,homeworld.residents -> {'homeworld': {'residents': {}}}
+    include = request.args.get('include')
+    if not include:
+        return {}
+    tree = {}
+    for path in filter(None, (path.strip() for path in include.split(','))):
+        names = path.split('.')
+        if len(names) > current_app.config['INCLUDE_MAX_DEPTH']:
+            raise APIException(f"include is limited to {current_app.config['INCLUDE_MAX_DEPTH']} levels: {path}", status_code=400)
+        node, current = tree, model
+        for name in names:
+            if name not in RELATIONS[current]:
+                allowed = ', '.join(sorted(RELATIONS[current]))
+                raise APIException(f"Unknown include {path}: {current.__name__} accepts {allowed}", status_code=400)
+            current = RELATIONS[current][name][0]
+            node = node.setdefault(name, {})
+    return tree
+
+def resolve(row, fields, tree):
+    """Serialize row with an "included" object per requested relation, level by level.
+
+    Each level is one query per model, joined to its summary by the unique url index;
+    lists are cut at INCLUDE_MAX_FANOUT urls and the whole response at INCLUDE_MAX_ROWS
+    rows. Returns (payload, loaded rows, truncated).
+    """
+    fanout = current_app.config['INCLUDE_MAX_FANOUT']
+    budget = current_app.config['INCLUDE_MAX_ROWS']
+    payload = row.serialize(fields)
+    loaded, truncated = [], False
+    level = [(row, tree, payload)]
+    while level:
+        links, wanted, pending = [], {}, 0
+        for obj, subtree, data in level:
+            for name, children in subtree.items():
+                target, many = RELATIONS[type(obj)][name]
+                urls = getattr(obj, name) if many else [getattr(obj, name)]
+                if len(urls) > fanout:
+                    urls, truncated = urls[:fanout], True
+                requested = wanted.setdefault(target, set())
+                targets = []
+                for url in filter(None, urls):
+                    if url not in requested:
+                        if len(loaded) + pending >= budget:
+                            truncated = True
+                            continue
+                        requested.add(url)
+                        pending += 1
+                    targets.append(url)
+                links.append((data, name, target, many, targets, children))
+
+        rows = {}
+        for target, urls in wanted.items():
+            if not urls:
+                continue
+            summary = SUMMARIES[target]
+            query = select(target).join(getattr(target, target.__summary__)).where(summary.url.in_(urls))
+            for item in db.session.execute(query).scalars():
+                rows[(target, item.url)] = item
+                loaded.append(item)
+
+        level = []
+        for data, name, target, many, targets, children in links:
+            resolved = []
+            for url in targets:
+                item = rows.get((target, url))
+                if item is None:
+                    continue
+                item_data = item.serialize()
+                resolved.append(item_data)
+                if children:
+                    level.append((item, children, item_data))
+            included = data.setdefault('included', {})
+            included[name] = resolved if many else (resolved[0] if resolved else None)
+    return payload, loaded, truncated
+
+def include_response(row, fields, tree, *etag_parts):
+    # La version depende tambien de las filas incluidas
+    payload, loaded, truncated = resolve(row, fields, tree)
+    last_edited = max([row.edited_at] + [item.edited_at for item in loaded])
+    etag = make_etag(*etag_parts, request.args.get('include'),
+                     *(f'{type(item).__name__}:{item.id}:{item.edited_at.isoformat()}' for item in loaded))
+    response = conditional_response(lambda: jsonify(payload), etag, last_edited)
+    if truncated:
+        response.headers['X-Include-Truncated'] = '1'
+    return response
+
+def setup_includes(app):
+    app.config.setdefault('INCLUDE_MAX_DEPTH', int(os.getenv('INCLUDE_MAX_DEPTH', 2)))
+    app.config.setdefault('INCLUDE_MAX_FANOUT', int(os.getenv('INCLUDE_MAX_FANOUT', 50)))
+    app.config.setdefault('INCLUDE_MAX_ROWS', int(os.getenv('INCLUDE_MAX_ROWS', 200)))
@@ -0,0 +1,140 @@
+import os
+import random
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(counts), total, sum_) for key, (counts, total, sum_) in self._series.items()}
+        for label_values, (counts, total, sum_) in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {total}')
+            lines.append(f'{self.name}_sum{{{labels}}} {sum_}')
+            lines.append(f'{self.name}_count{{{labels}}} {total}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+ENDPOINT_LABELS = ('method', 'endpoint', 'status')
+METRICS = {
+    'latency': Histogram('http_request_duration_seconds', 'Request latency.', ENDPOINT_LABELS, LATENCY_BUCKETS),
+    'db_time': Histogram('http_request_db_seconds', 'Time spent in SQL per request.', ENDPOINT_LABELS, LATENCY_BUCKETS),
+    'queries': Histogram('http_request_db_queries', 'SQL statements per request.', ENDPOINT_LABELS, QUERY_BUCKETS),
+    'serialize': Histogram('http_request_serialize_seconds', 'Time spent encoding JSON per request.', ENDPOINT_LABELS, LATENCY_BUCKETS),
+    'size': Histogram('http_response_size_bytes', 'Response body size (non-streamed responses).', ENDPOINT_LABELS, SIZE_BUCKETS),
+}
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_started' in g:
+        g.db_time = g.get('db_time', 0.0) + time.perf_counter() - g.pop('query_started')
+
+def _timed_dumps(dumps):
+    # Tiempo de codificacion JSON (jsonify y serializadores de respuesta)
+    def timed(obj, **kwargs):
+        if not has_request_context():
+            return dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            g.serialize_time = g.get('serialize_time', 0.0) + time.perf_counter() - start
+    return timed
+
+def render_metrics():
+    lines = []
+    for metric in METRICS.values():
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+def setup_instrumentation(app):
+    app.config.setdefault('METRICS_SAMPLE_RATE', float(os.getenv('METRICS_SAMPLE_RATE', 1.0)))
+    app.config.setdefault('SERVER_TIMING_HEADER', os.getenv('SERVER_TIMING_HEADER', '0') == '1')
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    app.json.dumps = _timed_dumps(app.json.dumps)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        rate = app.config['METRICS_SAMPLE_RATE']
+        g.metrics_sampled = rate >= 1 or random.random() < rate
+
+    # Numero de consultas SQL de la peticion, util para detectar N+1
+    @app.after_request
+    def record_request(response):
+        query_count = g.get('query_count', 0)
+        if app.config.get('QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(query_count)
+        if 'request_started' not in g:
+            return response
+
+        total = time.perf_counter() - g.request_started
+        db_time = g.get('db_time', 0.0)
+        serialize_time = g.get('serialize_time', 0.0)
+        if app.config['SERVER_TIMING_HEADER']:
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={db_time * 1000:.2f};desc="{query_count} queries"',
+                f'serialize;dur={serialize_time * 1000:.2f}',
+                f'app;dur={max(total - db_time - serialize_time, 0) * 1000:.2f}',
+                f'total;dur={total * 1000:.2f}',
+            ])
+
+        if g.metrics_sampled and request.endpoint != 'get_metrics':
+            labels = (request.method, request.endpoint or 'unmatched', str(response.status_code))
+            METRICS['latency'].observe(labels, total)
+            METRICS['db_time'].observe(labels, db_time)
+            METRICS['queries'].observe(labels, query_count)
+            METRICS['serialize'].observe(labels, serialize_time)
+            if not response.is_streamed and response.content_length is not None:
+                METRICS['size'].observe(labels, response.content_length)
+        return response
+
+    if os.getenv('METRICS_ENABLED', '1') != '1':
+        return
+
+    # Metricas por proceso: con varios workers de gunicorn cada uno expone las suyas
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -1,11 +1,101 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.types import JSON, TypeDecorator
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 import json
+from utils import APIException
 
 db = SQLAlchemy()
 
+class StringList(TypeDecorator):
+    """List of strings: a native ARRAY on Postgres, JSON everywhere else (SQLite)."""
+
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.ARRAY(db.String))
+        return dialect.type_descriptor(JSON())
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def _compile_serializer(model, fields):
+    # Genera una vez por modelo y conjunto de campos: def serialize(obj): return {...}
+    # Lee los valores de obj.__dict__; si falta alguno (expirado o diferido) usa el ORM.
+    fast, slow = [], []
+    for column in model.__table__.columns:
+        if column.name in model.__serialize_exclude__ or (fields is not None and column.name not in fields):
+            continue
+        attribute = model.__mapper__.get_property_by_column(column).key
+        convert = '_isoformat' if isinstance(column.type, db.DateTime) else ''
+        fast.append(f"{column.name!r}: {convert}(values[{attribute!r}])")
+        slow.append(f"{column.name!r}: {convert}(obj.{attribute})")
+    source = (
+        "def serialize(obj):\n"
+        "    values = obj.__dict__\n"
+        "    try:\n"
+        "        return {" + ", ".join(fast) + "}\n"
+        "    except KeyError:\n"
+        "        return {" + ", ".join(slow) + "}\n"
+    )
+    namespace = {'_isoformat': _isoformat}
+    exec(compile(source, f"<serializer {model.__name__}>", "exec"), namespace)
+    return namespace['serialize']
+
+def parse_number(value):
+    # "1,358" -> 1358.0; "unknown", "n/a", "" -> None
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+def numeric_shadows(model, values):
+    # Valores de las columnas numericas paralelas a partir de las columnas de texto
+    return {shadow: parse_number(values.get(source)) for source, shadow in model.__numeric_shadows__.items()}
+
+def insert_ignore(model, index_elements, dialect=None):
+    # INSERT que ignora filas duplicadas en esa restriccion unica (ON CONFLICT (...) DO NOTHING);
+    # cualquier otro error (p. ej. una colision de clave primaria) sigue siendo un error
+    dialect = dialect or db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model.__table__).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'sqlite':
+        return sqlite.insert(model.__table__).on_conflict_do_nothing(index_elements=index_elements)
+    # MySQL no admite destino: id = id deja la fila como estaba sin convertir errores en avisos como IGNORE
+    table = model.__table__
+    return mysql.insert(table).on_duplicate_key_update(id=table.c.id)
+
+def upsert(model, index_elements, columns, dialect=None, **fixed):
+    # INSERT ... ON CONFLICT (index_elements) DO UPDATE: columns toman el valor propuesto, fixed uno fijo
+    dialect = dialect or db.engine.dialect.name
+    table = model.__table__
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        values = {name: statement.excluded[name] for name in columns}
+        return statement.on_conflict_do_update(index_elements=index_elements, set_=dict(values, **fixed))
+    # MySQL no admite destino: se actualiza ante cualquier clave unica duplicada
+    statement = mysql.insert(table)
+    values = {name: statement.inserted[name] for name in columns}
+    return statement.on_duplicate_key_update(dict(values, **fixed))
+
+def inserted(result, dialect=None):
+    # Si el INSERT de insert_ignore (una fila) la creo. Con CLIENT_FOUND_ROWS, que SQLAlchemy activa
+    # en MySQL, el duplicado tambien cuenta una fila, pero no genera id
+    dialect = dialect or db.engine.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        return bool(result.lastrowid)
+    return result.rowcount > 0
+
 class BaseModel(db.Model):
     __abstract__ = True
+    __serialize_exclude__ = ()
+    __numeric_shadows__ = {}
+    __summary__ = None
+    __refs__ = None
 
     def __init__(self, **kwargs):
         columnas_filtradas = {key: kwargs[key] for key in kwargs if key in self.__table__.columns.keys()}
@@ -17,161 +107,316 @@ class BaseModel(db.Model):
 
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.to_json()}>"
+
+    @classmethod
+    def serializable_fields(cls):
+        return {column.name for column in cls.__table__.columns if column.name not in cls.__serialize_exclude__}
+
+    @classmethod
+    def serializer(cls, fields=None):
+        serializers = cls.__dict__.get('_serializers')
+        if serializers is None:
+            serializers = {}
+            setattr(cls, '_serializers', serializers)
+        if fields not in serializers:
+            serializers[fields] = _compile_serializer(cls, fields)
+        return serializers[fields]
+
+    def serialize(self, fields=None):
+        return self.serializer(fields)(self)
+
+@db.event.listens_for(BaseModel, 'before_insert', propagate=True)
+@db.event.listens_for(BaseModel, 'before_update', propagate=True)
+def sync_numeric_shadows(mapper, connection, target):
+    for source, shadow in target.__numeric_shadows__.items():
+        setattr(target, shadow, parse_number(getattr(target, source)))
+
+@db.event.listens_for(Session, 'before_flush')
+def sync_summaries(session, flush_context, instances):
+    # Person/Planet -> People/Planets en el mismo flush: una sola transaccion y un solo commit
+    for target in list(session.new) + list(session.dirty):
+        relationship = type(target).__summary__
+        if relationship is None or target in session.deleted:
+            continue
+        summary = getattr(target, relationship)
+        if summary is not None and not any(db.inspect(target).attrs[key].history.has_changes() for key in ('name', 'url')):
+            continue
+        mapping = type(target).__mapper__.relationships[relationship]
+        summary_class, foreign_key = mapping.mapper.class_, next(iter(mapping.remote_side)).key
+        with session.no_autoflush:
+            existing = session.query(summary_class).filter_by(url=target.url).first()
+        if existing is not None and existing is not summary:
+            # Solo se reutiliza un resumen sin detalle (importado sin Person/Planet)
+            if summary is not None or getattr(existing, foreign_key) is not None:
+                raise APIException(f'{summary_class.__name__} with url {target.url} already exists', status_code=409)
+            summary = existing
+        if summary is None:
+            summary = summary_class()
+        setattr(target, relationship, summary)
+        summary.name = target.name
+        summary.url = target.url
     
 class Favorite(BaseModel):
     __tablename__ = 'favorites'
+    __table_args__ = (
+        db.Index('ix_favorites_user_planet', 'user_id', 'planet_id', unique=True),
+        db.Index('ix_favorites_user_people', 'user_id', 'people_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    planet_id = db.Column(db.Integer, db.ForeignKey('planets.id'))
-    people_id = db.Column(db.Integer, db.ForeignKey('people.id'))
+    planet_id = db.Column(db.Integer, db.ForeignKey('planets.id'), index=True)
+    people_id = db.Column(db.Integer, db.ForeignKey('people.id'), index=True)
 
     user = db.relationship('User', back_populates='favorites')
     planet = db.relationship('Planets', back_populates='favorites')
     people = db.relationship('People', back_populates='favorites')
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "planet_id": self.planet_id,
-            "people_id": self.people_id
-        }
+    def serialize(self, expand=(), fields=None):
+        data = super().serialize(fields)
+        if 'people' in expand:
+            data["people"] = self.people.serialize() if self.people else None
+        if 'planets' in expand:
+            data["planet"] = self.planet.serialize() if self.planet else None
+        return data
 
 class User(BaseModel):
     __tablename__ = 'users'
+    __serialize_exclude__ = ('password',)
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(80), nullable=False)
     is_active = db.Column(db.Boolean(), nullable=False)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     favorites = db.relationship('Favorite', back_populates='user', lazy=True)
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "email": self.email,
-            "is_active": self.is_active
-        }
-
 class People(BaseModel):
     __tablename__ = 'people'
+    # El contador cambia sin tocar edited_at: fuera del payload cacheado (ver /people/popular)
+    __serialize_exclude__ = ('favorite_count',)
+    __table_args__ = (
+        db.Index('ix_people_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), unique=True, nullable=False)
     url = db.Column(db.String(450), unique=True, nullable=False)
     
     # Relación uno a uno con Person
-    person_id = db.Column(db.Integer, db.ForeignKey('person.id'))
+    person_id = db.Column(db.Integer, db.ForeignKey('person.id'), index=True)
     person = db.relationship('Person', back_populates='people', uselist=False)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     favorites = db.relationship('Favorite', back_populates='people')
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "url": self.url,
-            "person_id": self.person_id
-        }
-
 class Planets(BaseModel):
     __tablename__ = 'planets'
+    # El contador cambia sin tocar edited_at: fuera del payload cacheado (ver /planets/popular)
+    __serialize_exclude__ = ('favorite_count',)
+    __table_args__ = (
+        db.Index('ix_planets_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), unique=True, nullable=False)
     url = db.Column(db.String(450), unique=True, nullable=False)
     
     # Relación uno a uno con Planet
-    planet_id = db.Column(db.Integer, db.ForeignKey('planet.id'))
+    planet_id = db.Column(db.Integer, db.ForeignKey('planet.id'), index=True)
     planet = db.relationship('Planet', back_populates='planets', uselist=False)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     favorites = db.relationship('Favorite', back_populates='planet')
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "url": self.url,
-            "planet_id": self.planet_id
-        }
+class PersonRef(BaseModel):
+    """One row per url in a Person list column: indexed "people in film X" lookups on any backend."""
+    __tablename__ = 'person_refs'
+    __table_args__ = (
+        db.Index('ix_person_refs_kind_url', 'kind', 'url'),
+    )
+    owner_id = db.Column('person_id', db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    url = db.Column(db.String(450), primary_key=True)
+
+class PlanetRef(BaseModel):
+    """One row per url in a Planet list column (films, residents)."""
+    __tablename__ = 'planet_refs'
+    __table_args__ = (
+        db.Index('ix_planet_refs_kind_url', 'kind', 'url'),
+    )
+    owner_id = db.Column('planet_id', db.Integer, db.ForeignKey('planet.id', ondelete='CASCADE'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)
+    url = db.Column(db.String(450), primary_key=True)
 
 class Person(BaseModel):
     __tablename__ = 'person'
+    __summary__ = 'people'
+    __numeric_shadows__ = {'height': 'height_num', 'mass': 'mass_num'}
+    __serialize_exclude__ = tuple(__numeric_shadows__.values())
+    __refs__ = PersonRef
+    # Prefijos (?gender__prefix=) en Postgres; el btree de la columna sirve la igualdad
+    __table_args__ = (
+        db.Index('ix_person_gender_pattern', 'gender', postgresql_ops={'gender': 'text_pattern_ops'}),
+        db.Index('ix_person_homeworld_pattern', 'homeworld', postgresql_ops={'homeworld': 'text_pattern_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     birth_year = db.Column(db.String(150), nullable=False)
     eye_color = db.Column(db.String(150), nullable=False)
-    films = db.Column(db.ARRAY(db.String), nullable=False)
-    gender = db.Column(db.String(150), nullable=False)
+    films = db.Column(StringList, nullable=False)
+    gender = db.Column(db.String(150), nullable=False, index=True)
     hair_color = db.Column(db.String(150), nullable=False)
     height = db.Column(db.String(150), nullable=False)
-    homeworld = db.Column(db.String(150), nullable=False)
+    homeworld = db.Column(db.String(150), nullable=False, index=True)
     mass = db.Column(db.String(150), nullable=False)
     name = db.Column(db.String(150), nullable=False)
     skin_color = db.Column(db.String(150), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
-    edited_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
-    species = db.Column(db.ARRAY(db.String), nullable=False)
-    starships = db.Column(db.ARRAY(db.String), nullable=False)
-    url = db.Column(db.String(150), nullable=False)
-    vehicles = db.Column(db.ARRAY(db.String), nullable=False)
+    edited_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+    species = db.Column(StringList, nullable=False)
+    starships = db.Column(StringList, nullable=False)
+    url = db.Column(db.String(150), nullable=False, unique=True, index=True)
+    vehicles = db.Column(StringList, nullable=False)
+
+    # Copias numericas de height/mass ("unknown" -> NULL) para ordenar y agregar en SQL
+    height_num = db.Column(db.Float, index=True)
+    mass_num = db.Column(db.Float, index=True)
     
     # Relación uno a uno con People
     people = db.relationship('People', back_populates='person', uselist=False)
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "birth_year": self.birth_year,
-            "eye_color": self.eye_color,
-            "films": self.films,
-            "gender": self.gender,
-            "hair_color": self.hair_color,
-            "height": self.height,
-            "homeworld": self.homeworld,
-            "mass": self.mass,
-            "name": self.name,
-            "skin_color": self.skin_color,
-            "created_at": self.created_at.isoformat(),
-            "edited_at": self.edited_at.isoformat(),
-            "species": self.species,
-            "starships": self.starships,
-            "url": self.url,
-            "vehicles": self.vehicles
-        }
-
 class Planet(BaseModel):
     __tablename__= 'planet'
+    __summary__ = 'planets'
+    __numeric_shadows__ = {'diameter': 'diameter_num', 'orbital_period': 'orbital_period_num', 'population': 'population_num'}
+    __serialize_exclude__ = tuple(__numeric_shadows__.values())
+    __refs__ = PlanetRef
+    __table_args__ = (
+        db.Index('ix_planet_climate_pattern', 'climate', postgresql_ops={'climate': 'text_pattern_ops'}),
+        db.Index('ix_planet_terrain_pattern', 'terrain', postgresql_ops={'terrain': 'text_pattern_ops'}),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    climate = db.Column(db.String(150), nullable=False)
+    climate = db.Column(db.String(150), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
-    edited_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    edited_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
     diameter = db.Column(db.String(150), nullable=False)
-    films = db.Column(db.ARRAY(db.String), nullable=False)
+    films = db.Column(StringList, nullable=False)
     gravity = db.Column(db.String(150), nullable=False)
     name = db.Column(db.String(150), nullable=False)
     orbital_period = db.Column(db.String(150), nullable=False)
     population = db.Column(db.String(150), nullable=False)
-    residents = db.Column(db.ARRAY(db.String), nullable=False)
+    residents = db.Column(StringList, nullable=False)
     rotation_period = db.Column(db.String(150), nullable=False)
     surface_water = db.Column(db.String(150), nullable=False)
-    terrain = db.Column(db.String(150), nullable=False)
-    url = db.Column(db.String(150), nullable=False)
+    terrain = db.Column(db.String(150), nullable=False, index=True)
+    url = db.Column(db.String(150), nullable=False, unique=True, index=True)
+
+    # Copias numericas de diameter/orbital_period/population ("unknown" -> NULL)
+    diameter_num = db.Column(db.Float, index=True)
+    orbital_period_num = db.Column(db.Float, index=True)
+    population_num = db.Column(db.Float, index=True)
     
     # Relación uno a uno con Planets
     planets = db.relationship('Planets', back_populates='planet', uselist=False)
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "climate": self.climate,
-            "created_at": self.created_at.isoformat(),
-            "edited_at": self.edited_at.isoformat(),
-            "diameter": self.diameter,
-            "films": self.films,
-            "gravity": self.gravity,
-            "name": self.name,
-            "orbital_period": self.orbital_period,
-            "population": self.population,
-            "residents": self.residents,
-            "rotation_period": self.rotation_period,
-            "surface_water": self.surface_water,
-            "terrain": self.terrain,
-            "url": self.url
-        }
\ No newline at end of file
+def string_list_columns(model):
+    return [column.name for column in model.__table__.columns if isinstance(column.type, StringList)]
+
+def ref_rows(model, owner_id, values, kinds=None):
+    # {'films': [url, ...]} -> filas de la tabla de referencias (sin duplicados)
+    owner = model.__refs__.owner_id.expression.name
+    rows = {}
+    for kind in kinds or string_list_columns(model):
+        for url in values.get(kind) or ():
+            rows[(kind, url)] = {owner: owner_id, 'kind': kind, 'url': url}
+    return list(rows.values())
+
+def replace_refs(connection, model, ids_and_values, kinds=None):
+    # Sustituye las referencias de esas filas por las de sus listas actuales
+    refs = model.__refs__
+    ids = [owner_id for owner_id, _ in ids_and_values]
+    if not ids:
+        return
+    stale = delete(refs).where(refs.owner_id.in_(ids))
+    if kinds is not None:
+        stale = stale.where(refs.kind.in_(kinds))
+    connection.execute(stale)
+    rows = [row for owner_id, values in ids_and_values for row in ref_rows(model, owner_id, values, kinds)]
+    if rows:
+        connection.execute(insert(refs.__table__), rows)
+
+@db.event.listens_for(Person, 'after_insert')
+@db.event.listens_for(Planet, 'after_insert')
+def insert_refs(mapper, connection, target):
+    values = {kind: getattr(target, kind) for kind in string_list_columns(type(target))}
+    replace_refs(connection, type(target), [(target.id, values)])
+
+@db.event.listens_for(Person, 'after_update')
+@db.event.listens_for(Planet, 'after_update')
+def update_refs(mapper, connection, target):
+    state = db.inspect(target)
+    kinds = [kind for kind in string_list_columns(type(target)) if state.attrs[kind].history.has_changes()]
+    if kinds:
+        replace_refs(connection, type(target), [(target.id, {kind: getattr(target, kind) for kind in kinds})], kinds)
+
+@db.event.listens_for(Person, 'before_delete')
+@db.event.listens_for(Planet, 'before_delete')
+def delete_refs(mapper, connection, target):
+    # SQLite no aplica ON DELETE CASCADE sin PRAGMA foreign_keys
+    refs = type(target).__refs__
+    connection.execute(delete(refs).where(refs.owner_id == target.id))
+
+
+FAVORITE_COUNTERS = (
+    (User, Favorite.user_id),
+    (Planets, Favorite.planet_id),
+    (People, Favorite.people_id),
+)
+
+@db.event.listens_for(Favorite, 'after_insert')
+def increment_favorite_counts(mapper, connection, target):
+    _change_favorite_counts(connection, target, 1)
+
+@db.event.listens_for(Favorite, 'after_delete')
+def decrement_favorite_counts(mapper, connection, target):
+    _change_favorite_counts(connection, target, -1)
+
+def _change_favorite_counts(connection, target, delta):
+    # Contadores en la misma transaccion que el favorito (UPDATE atomico, sin leer antes)
+    for model, column in FAVORITE_COUNTERS:
+        item_id = getattr(target, column.key)
+        if item_id is not None:
+            connection.execute(update(model).where(model.id == item_id).values(favorite_count=model.favorite_count + delta))
+
+def favorite_recounts(user_ids=(), planet_ids=(), people_ids=()):
+    # Para escrituras en bloque (INSERT ... ON CONFLICT, DELETE ... IN): se recuentan los afectados
+    statements = []
+    for (model, column), ids in zip(FAVORITE_COUNTERS, (user_ids, planet_ids, people_ids)):
+        if ids:
+            count = select(func.count()).where(column == model.id).scalar_subquery()
+            statements.append(update(model).where(model.id.in_(sorted(set(ids)))).values(favorite_count=count))
+    return statements
+
+# Logica de usuarios y favoritos compartida por app.py (WSGI) y asgi.py
+
+def user_values(data):
+    # Cuerpo de POST /users: None si faltan email o password
+    data = data or {}
+    if not data.get('email') or not data.get('password'):
+        return None
+    return {'email': data['email'], 'password': data['password'], 'is_active': True}
+
+def created_user(user_id, values):
+    # El INSERT ignora duplicados y no devuelve la fila: se construye sin otra consulta
+    return User(id=user_id, favorite_count=0, **values)
+
+def favorites_expand(args):
+    expand = set(filter(None, args.get('expand', '').split(',')))
+    if not expand <= {'people', 'planets'}:
+        raise APIException('expand only accepts people and planets', status_code=400)
+    return expand
+
+def favorites_options(expand):
+    # Una sola consulta: usuario + favoritos (+ people/planets si se expanden)
+    options = [joinedload(User.favorites)]
+    if 'people' in expand:
+        options.append(joinedload(User.favorites).joinedload(Favorite.people))
+    if 'planets' in expand:
+        options.append(joinedload(User.favorites).joinedload(Favorite.planet))
+    return options
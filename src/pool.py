@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from flask import jsonify
+from sqlalchemy.pool import QueuePool
+from models import db
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that also records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+def _env_flag(name, default):
+    return os.getenv(name, '1' if default else '0').lower() in ('1', 'true', 'yes')
+
+def engine_options(database_uri):
+    # SQLite no usa pool de conexiones en red: se dejan los valores por defecto
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    # Por defecto, una conexion por hilo de gunicorn mas una de reserva;
+    # los workers gevent/eventlet atienden muchas peticiones a la vez
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+    threads = int(os.getenv('GUNICORN_THREADS', 1))
+    if worker_class in ('gevent', 'eventlet'):
+        pool_size, max_overflow = 10, 20
+    else:
+        pool_size, max_overflow = threads + 1, threads
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', True),
+    }
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and database_uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+def async_database_uri(database_uri):
+    # Mismo servidor, driver asincrono: asyncpg para Postgres, aiosqlite para SQLite
+    if database_uri.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + database_uri[len('postgresql://'):]
+    if database_uri.startswith('sqlite://'):
+        return 'sqlite+aiosqlite://' + database_uri[len('sqlite://'):]
+    return database_uri
+
+def async_engine_options(database_uri):
+    # Un solo proceso atiende muchas peticiones a la vez: pool como el de gevent/eventlet
+    if database_uri.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', True),
+    }
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and database_uri.startswith('postgresql'):
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(statement_timeout))}}
+    return options
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update({
+            'checkouts': pool.checkouts,
+            'wait_avg_ms': pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0.0,
+            'wait_max_ms': pool.wait_max * 1000,
+        })
+    return stats
+
+def setup_pool_stats(app):
+    if not _env_flag('POOL_STATS_ENABLED', False):
+        return
+
+    @app.route('/internal/pool', methods=['GET'])
+    def get_pool_stats():
+        return jsonify(pool_stats(db.engine)), 200
@@ -0,0 +1,123 @@
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import time
+from collections import Counter
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger('profiler')
+
+MAX_STATEMENTS = 500
+
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r'\((\s*(\?|%\([^)]+\)s|:\w+|\$\d+)\s*,?)+\)')
+_SPACES = re.compile(r'\s+')
+
+def fingerprint(statement):
+    # Misma consulta con otros parametros -> misma huella ("IN (?, ?, ?)" -> "IN (...)")
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(...)', statement)
+    return _SPACES.sub(' ', statement).strip()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_log' in g:
+        g.sql_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_started' in g:
+        duration = time.perf_counter() - g.pop('sql_started')
+        if len(g.sql_log) < MAX_STATEMENTS:
+            g.sql_log.append((statement, duration))
+
+def sql_report(sql_log, repeat_threshold):
+    fingerprints = Counter()
+    time_by_fingerprint = Counter()
+    for statement, duration in sql_log:
+        key = fingerprint(statement)
+        fingerprints[key] += 1
+        time_by_fingerprint[key] += duration
+    return {
+        'statements': [{'sql': statement, 'ms': round(duration * 1000, 3)} for statement, duration in sql_log],
+        # La misma huella repetida muchas veces en una peticion suele ser un N+1
+        'repeated': [
+            {'fingerprint': key, 'count': count, 'ms': round(time_by_fingerprint[key] * 1000, 3)}
+            for key, count in fingerprints.most_common() if count >= repeat_threshold
+        ],
+    }
+
+def _profile_allowed(admin_key):
+    if request.args.get('_profile') != '1' or not admin_key:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Key', ''), admin_key)
+
+def setup_profiler(app):
+    app.config.setdefault('SLOW_REQUEST_MS', float(os.getenv('SLOW_REQUEST_MS', 500)))
+    app.config.setdefault('SLOW_REQUEST_QUERIES', int(os.getenv('SLOW_REQUEST_QUERIES', 20)))
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', int(os.getenv('N_PLUS_ONE_THRESHOLD', 5)))
+    app.config.setdefault('PROFILER_ADMIN_KEY', os.getenv('PROFILER_ADMIN_KEY'))
+    if os.getenv('PROFILER_ENABLED', '1') != '1':
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_profiler():
+        g.sql_log = []
+        g.profile_started = time.perf_counter()
+        if _profile_allowed(app.config['PROFILER_ADMIN_KEY']):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def report_profile(response):
+        if 'profile_started' not in g:
+            return response
+        elapsed_ms = (time.perf_counter() - g.profile_started) * 1000
+        profiler = g.pop('profiler', None)
+        threshold = app.config['N_PLUS_ONE_THRESHOLD']
+
+        # ?_profile=1: se devuelve el desglose en lugar de la respuesta
+        if profiler is not None:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(40)
+            return jsonify({
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'ms': round(elapsed_ms, 3),
+                'sql': sql_report(g.sql_log, threshold),
+                'profile': output.getvalue().splitlines(),
+            })
+
+        slow = elapsed_ms >= app.config['SLOW_REQUEST_MS']
+        chatty = len(g.sql_log) >= app.config['SLOW_REQUEST_QUERIES']
+        if slow or chatty:
+            record = {
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.full_path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'ms': round(elapsed_ms, 3),
+                'queries': len(g.sql_log),
+                **sql_report(g.sql_log, threshold),
+            }
+            logger.warning(json.dumps(record))
+        return response
+
+    @app.teardown_request
+    def stop_profiler(error=None):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,243 @@
+"""
+Prebuilt catalogue snapshot: People/Planets list rows and Person/Planet detail bodies,
+serialized once by `flask build-snapshot` and served from a read-only mmap.
+
+File layout (little endian):
+
+    [data of every section][index of every section][header JSON][uint32 header length][MAGIC]
+
+Each index is a sorted array of (id int64, start uint64, end uint64) entries pointing at a
+body in the data. List rows of a section are written one after another separated by ",",
+so a page is a single slice of the file between the first and last row.
+
+The files are written next to a `current.snap` symlink that is swapped atomically after
+each build; workers notice the new target within SNAPSHOT_CHECK_INTERVAL seconds. Every
+worker maps the same file, so the pages live once in the OS page cache.
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+from flask import current_app, request, Response
+from sqlalchemy import select
+from models import db, People, Planets, Person, Planet
+from utils import decode_cursor, encode_cursor, page_size, stream_format, set_next_link, make_etag, conditional_response
+
+MAGIC = b'SWSNAP01'
+ENTRY = struct.Struct('<qQQ')
+FOOTER = struct.Struct('<I8s')
+CURRENT = 'current.snap'
+
+# Seccion -> (filas en orden de id) para construir el fichero
+SECTIONS = {
+    'people': lambda: select(People.id, People).order_by(People.id),
+    'planets': lambda: select(Planets.id, Planets).order_by(Planets.id),
+    'person': lambda: select(People.id, Person).join(People.person).order_by(People.id),
+    'planet': lambda: select(Planets.id, Planet).join(Planets.planet).order_by(Planets.id),
+}
+LIST_SECTIONS = ('people', 'planets')
+
+# Endpoint -> (seccion, argumento de la ruta o None para las listas)
+ROUTES = {
+    'api.get_all_people': ('people', None),
+    'api.get_all_planets': ('planets', None),
+    'api.get_person': ('person', 'people_id'),
+    'api.get_planet': ('planet', 'planet_id'),
+}
+LIST_ARGS = {'after', 'limit'}
+
+def build_snapshot(directory, keep=3, batch_size=1000):
+    """Writes a new snapshot file, points current.snap at it and removes old versions."""
+    os.makedirs(directory, exist_ok=True)
+    dumps = current_app.json.dumps
+    digest = hashlib.sha1()
+    sections, indexes = {}, {}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for name, query in SECTIONS.items():
+                separator = b',' if name in LIST_SECTIONS else b''
+                start, entries = file.tell(), []
+                for item_id, row in db.session.execute(query().execution_options(yield_per=batch_size)):
+                    if entries and separator:
+                        file.write(separator)
+                    body = dumps(row.serialize()).encode()
+                    offset = file.tell()
+                    file.write(body)
+                    digest.update(body)
+                    entries.append((item_id, offset, offset + len(body)))
+                sections[name] = {'count': len(entries), 'data_start': start, 'data_end': file.tell()}
+                indexes[name] = entries
+            for name, entries in indexes.items():
+                sections[name]['index'] = file.tell()
+                for entry in entries:
+                    file.write(ENTRY.pack(*entry))
+
+            version = f"{datetime.now():%Y%m%d%H%M%S}-{digest.hexdigest()[:8]}"
+            header = json.dumps({'version': version, 'built_at': datetime.now().isoformat(), 'sections': sections}).encode()
+            file.write(header)
+            file.write(FOOTER.pack(len(header), MAGIC))
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    counts = {name: section['count'] for name, section in sections.items()}
+    current = _current_file(directory)
+    if current and current.endswith(f'-{digest.hexdigest()[:8]}.snap'):
+        # Mismo contenido que el snapshot actual: no se publica otra version
+        os.unlink(tmp_path)
+        return os.path.join(directory, current), current[len('catalogue-'):-len('.snap')], counts
+    path = os.path.join(directory, f'catalogue-{version}.snap')
+    # mkstemp crea el fichero con 0600: los workers pueden correr con otro usuario
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+    # Cambio atomico del enlace: los lectores ven el fichero anterior o el nuevo
+    link_tmp = os.path.join(directory, f'.{CURRENT}.{os.getpid()}')
+    os.symlink(os.path.basename(path), link_tmp)
+    os.replace(link_tmp, os.path.join(directory, CURRENT))
+
+    # Los workers que aun mapean un fichero borrado lo siguen leyendo hasta cambiar
+    old = sorted(entry for entry in os.listdir(directory) if entry.startswith('catalogue-') and entry.endswith('.snap'))
+    for entry in old[:-keep] if keep > 0 else []:
+        os.unlink(os.path.join(directory, entry))
+    return path, version, counts
+
+def _current_file(directory):
+    try:
+        return os.readlink(os.path.join(directory, CURRENT))
+    except OSError:
+        return None
+
+class Snapshot:
+    """A snapshot file mapped read-only; lookups read the index straight from the map."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_length, magic = FOOTER.unpack_from(self.buffer, len(self.buffer) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalogue snapshot')
+        header_start = len(self.buffer) - FOOTER.size - header_length
+        header = json.loads(self.buffer[header_start:header_start + header_length])
+        self.path = path
+        self.version = header['version']
+        self.sections = {name: _Index(self.buffer, section) for name, section in header['sections'].items()}
+
+    def get(self, section, item_id):
+        index = self.sections[section]
+        position = bisect.bisect_left(index, item_id)
+        if position == len(index) or index[position] != item_id:
+            return None
+        _, start, end = index.entry(position)
+        return self.buffer[start:end]
+
+    def page(self, section, after, limit):
+        # Filas con id > after: una sola lectura contigua del fichero
+        index = self.sections[section]
+        first = bisect.bisect_right(index, after) if after is not None else 0
+        last = min(first + limit, len(index)) - 1
+        if last < first:
+            return b'[]', None
+        _, start, _ = index.entry(first)
+        last_id, _, end = index.entry(last)
+        next_cursor = encode_cursor([last_id]) if last + 1 < len(index) else None
+        return b'[' + self.buffer[start:end] + b']', next_cursor
+
+class _Index:
+    # Secuencia de ids para bisect sin copiar el indice a la memoria del proceso
+    def __init__(self, buffer, section):
+        self.buffer = buffer
+        self.offset = section['index']
+        self.count = section['count']
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        return ENTRY.unpack_from(self.buffer, self.offset + position * ENTRY.size)[0]
+
+    def entry(self, position):
+        return ENTRY.unpack_from(self.buffer, self.offset + position * ENTRY.size)
+
+class SnapshotStore:
+    """Follows the current.snap symlink and swaps to the new file when it changes."""
+
+    def __init__(self, directory, check_interval):
+        self.link = os.path.join(directory, CURRENT)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._target = None
+        self._checked_at = 0
+
+    def current(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                target = os.path.realpath(self.link, strict=True)
+            except OSError:
+                self._snapshot = self._target = None
+                return None
+            if target != self._target:
+                try:
+                    self._snapshot = Snapshot(target)
+                    self._target = target
+                except (OSError, ValueError):
+                    current_app.logger.exception('could not load snapshot %s', target)
+        return self._snapshot
+
+def snapshot_response(store):
+    # Solo peticiones sin filtros, campos ni formatos: el resto sigue en la base de datos
+    route = ROUTES.get(request.endpoint)
+    if route is None or request.method != 'GET' or stream_format():
+        return None
+    section, item_arg = route
+    if item_arg is not None and request.args or item_arg is None and not set(request.args) <= LIST_ARGS:
+        return None
+    snapshot = store.current()
+    if snapshot is None:
+        return None
+
+    if item_arg is not None:
+        body = snapshot.get(section, request.view_args[item_arg])
+        if body is None:
+            # Fila creada despues del snapshot (o inexistente): la resuelve la ruta
+            return None
+        next_cursor = None
+    else:
+        after = decode_cursor(request.args.get('after'))
+        body, next_cursor = snapshot.page(section, after[-1] if after else None, page_size())
+
+    def build():
+        response = Response(body, mimetype='application/json')
+        set_next_link(response, next_cursor)
+        return response
+
+    response = conditional_response(build, make_etag('snapshot', snapshot.version, request.full_path))
+    response.headers['X-Snapshot'] = snapshot.version
+    return response
+
+def setup_snapshot(app):
+    app.config.setdefault('SNAPSHOT_DIR', os.getenv('SNAPSHOT_DIR', '/tmp/catalogue-snapshots'))
+    app.config.setdefault('SNAPSHOT_KEEP', int(os.getenv('SNAPSHOT_KEEP', 3)))
+    app.config.setdefault('SNAPSHOT_SERVING', os.getenv('SNAPSHOT_SERVING', '0') == '1')
+    app.config.setdefault('SNAPSHOT_CHECK_INTERVAL', float(os.getenv('SNAPSHOT_CHECK_INTERVAL', 1)))
+    if not app.config['SNAPSHOT_SERVING']:
+        return
+
+    store = app.extensions['snapshot'] = SnapshotStore(app.config['SNAPSHOT_DIR'], app.config['SNAPSHOT_CHECK_INTERVAL'])
+
+    @app.before_request
+    def serve_from_snapshot():
+        return snapshot_response(store)
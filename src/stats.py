@@ -0,0 +1,73 @@
+from flask import request
+from sqlalchemy import Integer, case, cast, func, select
+from models import db
+from utils import APIException
+
+MAX_BINS = 50
+TOP_VALUES = 20
+MAX_POPULAR = 100
+
+def _histogram(column, low, high, bins, count):
+    # Cubos de igual anchura entre min y max, contados con GROUP BY en la base de datos
+    if low == high:
+        # Todos los valores iguales: un unico cubo, sin consulta
+        return [{'from': low, 'to': high, 'count': count}]
+    width = (high - low) / bins
+    position = (column - low) / width
+    if db.engine.dialect.name == 'sqlite':
+        bucket = cast(position, Integer)
+    else:
+        bucket = func.floor(position)
+    bucket = case((column >= high, bins - 1), else_=bucket)
+    rows = db.session.execute(
+        select(bucket, func.count()).where(column.isnot(None)).group_by(bucket).order_by(bucket)
+    ).all()
+    return [{'from': low + int(index) * width, 'to': low + (int(index) + 1) * width, 'count': count} for index, count in rows]
+
+def _top_values(column):
+    rows = db.session.execute(
+        select(column, func.count()).group_by(column).order_by(func.count().desc(), column).limit(TOP_VALUES)
+    ).all()
+    return [{'value': value, 'count': count} for value, count in rows]
+
+def catalogue_stats(model, categorical):
+    try:
+        bins = int(request.args.get('bins', 10))
+    except ValueError:
+        raise APIException('bins must be an integer', status_code=400)
+    if not 1 <= bins <= MAX_BINS:
+        raise APIException(f'bins must be between 1 and {MAX_BINS}', status_code=400)
+
+    # count/min/max/avg de todas las columnas numericas en una sola consulta
+    numeric = [(source, getattr(model, shadow)) for source, shadow in model.__numeric_shadows__.items()]
+    aggregates = [func.count(model.id)]
+    for _, column in numeric:
+        aggregates += [func.count(column), func.min(column), func.max(column), func.avg(column)]
+    row = db.session.execute(select(*aggregates)).one()
+
+    stats = {'count': row[0]}
+    for position, (source, column) in enumerate(numeric):
+        count, low, high, average = row[1 + 4 * position:5 + 4 * position]
+        stats[source] = {
+            'count': count,
+            'min': low,
+            'max': high,
+            'avg': float(average) if average is not None else None,
+            'histogram': _histogram(column, low, high, bins, count) if count else [],
+        }
+    for name in categorical:
+        stats[name] = _top_values(getattr(model, name))
+    return stats
+
+def popular_items(model):
+    # Top-K por el contador mantenido en escritura: ORDER BY favorite_count DESC LIMIT k sobre su indice
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        raise APIException('limit must be an integer', status_code=400)
+    if not 1 <= limit <= MAX_POPULAR:
+        raise APIException(f'limit must be between 1 and {MAX_POPULAR}', status_code=400)
+    rows = db.session.execute(
+        select(model).where(model.favorite_count > 0).order_by(model.favorite_count.desc(), model.id).limit(limit)
+    ).scalars()
+    return [dict(row.serialize(), favorite_count=row.favorite_count) for row in rows]
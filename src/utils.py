@@ -1,4 +1,15 @@
-from flask import jsonify, url_for
+import base64
+import hashlib
+import json
+from flask import jsonify, url_for, request, current_app, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +26,206 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson when it is installed; pretty-printing falls back to json."""
+
+    def dumps(self, obj, **kwargs):
+        # jsonify siempre pasa separators (compacto) o indent (debug): solo lo que orjson no sabe hacer va a json
+        if orjson is None or kwargs.keys() - {'separators', 'sort_keys', 'default'} \
+                or tuple(kwargs.get('separators', (',', ':'))) != (',', ':'):
+            return super().dumps(obj, **kwargs)
+        # Las fechas pasan por default (http_date), igual que con json
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+def requested_fields(model):
+    return parse_fields(request.args, model)
+
+def parse_fields(args, model):
+    # ?fields=name,url -> columnas a cargar y serializar (el id siempre se incluye); tambien lo usa asgi.py
+    fields = args.get('fields')
+    if not fields:
+        return None
+    fields = {field.strip() for field in fields.split(',') if field.strip()} | {'id'}
+    unknown = fields - model.serializable_fields()
+    if unknown:
+        raise APIException(f"Unknown fields: {', '.join(sorted(unknown))}", status_code=400)
+    return tuple(sorted(fields))
+
+def load_fields(model, fields):
+    return load_only(*(getattr(model, field) for field in fields))
+
+def sparse_query(model):
+    # Las columnas pedidas se empujan al SELECT (load_only) y al serializador
+    fields = requested_fields(model)
+    query = model.query.options(load_fields(model, fields)) if fields else model.query
+    return query, model.serializer(fields)
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise APIException('Invalid cursor', status_code=400)
+    if not isinstance(values, list) or not values or not isinstance(values[-1], int):
+        raise APIException('Invalid cursor', status_code=400)
+    return values
+
+def page_size():
+    return parse_page_size(request.args, current_app.config)
+
+def parse_page_size(args, config):
+    # config: app.config o cualquier mapping con PAGE_SIZE y MAX_PAGE_SIZE
+    max_size = config['MAX_PAGE_SIZE']
+    limit = args.get('limit')
+    if limit is None:
+        return min(config['PAGE_SIZE'], max_size)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise APIException('limit must be an integer', status_code=400)
+    if limit < 1:
+        raise APIException('limit must be greater than 0', status_code=400)
+    return min(limit, max_size)
+
+def _after_sort_key(column, descending, key_column, after):
+    # Siguiente pagina en orden (column, key) con los NULL al final
+    value, key = after
+    if value is None:
+        return and_(column.is_(None), key_column > key)
+    beyond = column < value if descending else column > value
+    return or_(beyond, and_(column == value, key_column > key), column.is_(None))
+
+def paginate(query, key_column, sort=None):
+    # Paginacion por cursor (keyset): WHERE id > :after ORDER BY id LIMIT :limit + 1
+    limit = page_size()
+    query, cursor_of = _keyset(query, key_column, sort)
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(cursor_of(rows[-1]))
+    return rows, next_cursor
+
+def _keyset(query, key_column, sort):
+    # Orden y filtro ?after= comunes a paginate() y stream_rows()
+    after = decode_cursor(request.args.get('after'))
+    if sort is None:
+        if after is not None:
+            query = query.filter(key_column > after[-1])
+        return query.order_by(key_column), lambda row: [getattr(row, key_column.key)]
+    # sort = (columna, descendente, valor de la columna para una fila)
+    column, descending, sort_value = sort
+    if after is not None:
+        if len(after) != 2:
+            raise APIException('Invalid cursor', status_code=400)
+        query = query.filter(_after_sort_key(column, descending, key_column, after))
+    order = column.desc() if descending else column.asc()
+    query = query.order_by(order.nullslast(), key_column)
+    return query, lambda row: [sort_value(row), getattr(row, key_column.key)]
+
+def set_next_link(response, next_cursor):
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        link = url_for(request.endpoint, _external=True, **(request.view_args or {}), **args)
+        response.headers['Link'] = f'<{link}>; rel="next"'
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def paginated_response(items, next_cursor):
+    return set_next_link(jsonify(items), next_cursor)
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+def conditional_response(build, etag, last_modified=None):
+    # GET condicional: 304 sin serializar si el cliente ya tiene esta version
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+    if request.if_none_match:
+        modified = not request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since:
+        modified = request.if_modified_since.replace(tzinfo=None) < last_modified
+    else:
+        modified = True
+
+    response = current_app.make_response(build()) if modified else Response(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def stream_format():
+    # Exportacion completa en streaming: ?stream=1 (array JSON por chunks) o Accept: application/x-ndjson
+    if request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if request.args.get('format') == 'ndjson':
+        return 'ndjson'
+    if request.args.get('stream') in ('1', 'true'):
+        return 'json'
+    return None
+
+def stream_rows(query, key_column, serialize, fmt, sort=None):
+    # Mismo orden (?sort=) y mismo cursor (?after=) que las paginas
+    query, _ = _keyset(query, key_column, sort)
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    rows = query.yield_per(batch_size)
+    dumps = current_app.json.dumps
+
+    def batches():
+        chunk = []
+        for row in rows:
+            chunk.append(dumps(serialize(row)))
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def generate():
+        if fmt == 'ndjson':
+            for chunk in batches():
+                yield '\n'.join(chunk) + '\n'
+            return
+        yield '['
+        separator = ''
+        for chunk in batches():
+            yield separator + ','.join(chunk)
+            separator = ','
+        yield ']'
+
+    mimetype = NDJSON_MIMETYPE if fmt == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    # El mapa de rutas no cambia tras arrancar: se genera una vez por app
+    html = app.extensions.get('sitemap')
+    if html is None:
+        html = app.extensions['sitemap'] = _render_sitemap(app)
+    return html
+
+def _render_sitemap(app):
+    links = ['/admin/'] if 'admin' in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
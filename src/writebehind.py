@@ -0,0 +1,393 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from flask import current_app, jsonify
+from sqlalchemy import delete, select, tuple_
+from models import db, insert_ignore, favorite_recounts, User, People, Planets, Favorite
+
+logger = logging.getLogger('writebehind')
+
+KINDS = {
+    'planet': (Planets, Favorite.planet_id),
+    'people': (People, Favorite.people_id),
+}
+
+class QueueFull(Exception):
+    pass
+
+class KnownIds:
+    """In-memory id sets for users, planets and people, loaded on first use.
+
+    A miss falls back to one primary-key lookup, so rows created after the load are found;
+    deletions are caught when the batch is flushed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+
+    def _load(self, model):
+        ids = self._ids.get(model)
+        if ids is None:
+            ids = set(db.session.execute(select(model.id)).scalars())
+            with self._lock:
+                self._ids[model] = ids
+        return ids
+
+    def exists(self, model, item_id):
+        if not isinstance(item_id, int):
+            return False
+        if item_id in self._load(model):
+            return True
+        if db.session.execute(select(model.id).where(model.id == item_id)).scalar() is None:
+            return False
+        with self._lock:
+            self._ids[model].add(item_id)
+        return True
+
+class OperationLog:
+    """Append-only NDJSON log of acknowledged operations, one file per process.
+
+    File names carry the pid, a random token (pids are reused, e.g. by restarted
+    gunicorn workers in a container) and a generation bumped on each rotation. The
+    current file is held with an exclusive flock while its process is alive; any log
+    that can be locked belongs to a dead process and is replayed, then removed.
+    """
+
+    def __init__(self, directory, fsync):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.token = uuid.uuid4().hex[:12]
+        self.generation = 0
+        self.path, self._file = self._open()
+
+    def _open(self):
+        self.generation += 1
+        path = os.path.join(self.directory, f'favorites-{os.getpid()}-{self.token}-{self.generation:06d}.log')
+        file = open(path, 'xb')
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return path, file
+
+    def append(self, operation):
+        self._write([operation])
+
+    def _write(self, operations):
+        self._file.write(b''.join(json.dumps(operation, separators=(',', ':')).encode() + b'\n' for operation in operations))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def truncate(self):
+        self._file.truncate(0)
+        self._file.flush()
+
+    def rotate(self, operations):
+        # Nuevo fichero con solo lo pendiente; el anterior se borra despues (un fallo entre medias
+        # deja los dos y se reproducen en orden de generacion)
+        old_path, old_file = self.path, self._file
+        self.path, self._file = self._open()
+        self._write(operations)
+        os.remove(old_path)
+        old_file.close()
+
+def orphan_logs(directory, own=None):
+    """Yields (path, operations) of logs of dead processes; the flock is held until the next item."""
+    for path in sorted(glob.glob(os.path.join(directory, 'favorites-*.log'))):
+        if path == own:
+            continue
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            # Ya recuperado y borrado por otro proceso
+            continue
+        with file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Lo tiene otro proceso vivo, o lo esta recuperando
+                continue
+            if not os.path.exists(path):
+                continue
+            operations = [json.loads(line) for line in file if line.strip()]
+            # Quien lo consume lo borra con el flock aun tomado
+            yield path, operations
+
+class FavoritesQueue:
+    """Write-behind queue for favorite adds and removes.
+
+    Requests validate ids against KnownIds, append to the log, enqueue and return; a
+    background thread coalesces operations (last one per user/target wins) and flushes
+    them in batched transactions. Pending operations are overlaid on reads of the same
+    process, so a user sees their own writes before they reach the database.
+
+    That overlay only covers the worker that accepted the write: with several gunicorn
+    workers a read served by another one sees the database until the batch is flushed
+    (FAVORITES_FLUSH_INTERVAL, 0.2s by default).
+    """
+
+    def __init__(self, app, maxsize, put_timeout, batch_size, flush_interval, log_dir, fsync):
+        self.app = app
+        self.maxsize = maxsize
+        self.queue = queue.Queue()
+        self._slots = threading.Semaphore(maxsize)
+        self.put_timeout = put_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log_dir = log_dir
+        self.fsync = fsync
+        self.known = KnownIds()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._seq = 0
+        self._flushed_seq = 0
+        self._pid = None
+        self._log = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.flushed = 0
+        self.failures = 0
+
+    def _running(self):
+        return self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self):
+        # El hilo y el log se crean en el proceso que atiende (despues del fork de gunicorn)
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                self._log = OperationLog(self.log_dir, self.fsync)
+            else:
+                # El hilo murio: se relanza con el mismo log (su flock sigue siendo nuestro)
+                logger.error('favorites writer thread was not running, restarting it')
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='favorites-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, op, kind, user_id, target_id):
+        model, _ = KINDS[kind]
+        if not self.known.exists(User, user_id):
+            return jsonify({'error': 'User not found'}), 404
+        if op == 'add' and not self.known.exists(model, target_id):
+            return jsonify({'error': f'{model.__name__} not found'}), 404
+
+        self._ensure_started()
+        # Contrapresion: se espera un hueco hasta put_timeout y si no, 503
+        if not self._slots.acquire(timeout=self.put_timeout):
+            raise QueueFull()
+        with self._lock:
+            self._seq += 1
+            operation = {'seq': self._seq, 'op': op, 'kind': kind, 'user_id': user_id, 'target_id': target_id}
+            self._log.append(operation)
+            self._pending.setdefault(user_id, {})[(kind, target_id)] = operation
+            self.queue.put_nowait(operation)
+        return jsonify({'queued': True, 'op': op, 'user_id': user_id, f'{kind}_id': target_id}), 202
+
+    def overlay(self, user_id, favorites, expand=()):
+        # Lectura de las propias escrituras: favoritos en BD + operaciones aun en cola
+        with self._lock:
+            pending = {key: operation['op'] for key, operation in self._pending.get(user_id, {}).items()}
+        if not pending:
+            return favorites
+        result, present = [], set()
+        for favorite in favorites:
+            key = ('planet', favorite['planet_id']) if favorite['planet_id'] is not None else ('people', favorite['people_id'])
+            if pending.get(key) == 'remove':
+                continue
+            present.add(key)
+            result.append(favorite)
+        for (kind, target_id), op in pending.items():
+            if op != 'add' or (kind, target_id) in present:
+                continue
+            favorite = {'id': None, 'user_id': user_id, 'planet_id': None, 'people_id': None, f'{kind}_id': target_id}
+            if 'people' in expand:
+                favorite['people'] = self._expand(People, target_id) if kind == 'people' else None
+            if 'planets' in expand:
+                favorite['planet'] = self._expand(Planets, target_id) if kind == 'planet' else None
+            result.append(favorite)
+        return result
+
+    @staticmethod
+    def _expand(model, target_id):
+        # Puede haberse borrado despues de encolar la operacion
+        item = model.query.get(target_id)
+        return item.serialize() if item else None
+
+    def _run(self):
+        with self.app.app_context():
+            if not self._recover(retry=True):
+                return
+            while not self._stopping.is_set() or not self.queue.empty():
+                batch = self._collect()
+                if batch:
+                    self._flush_with_retry(batch)
+                db.session.remove()
+
+    def _retry(self, flush, operations):
+        # Reintenta con espera exponencial; False si se esta parando antes de lograrlo
+        delay = 0.5
+        while True:
+            try:
+                flush(operations)
+                return True
+            except Exception:
+                db.session.rollback()
+                self.failures += 1
+                logger.exception('favorites flush failed, retrying in %.1fs', delay)
+                if self._stopping.wait(delay):
+                    return False
+                delay = min(delay * 2, 30)
+
+    def _collect(self):
+        try:
+            batch = [self.queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_with_retry(self, batch):
+        if not self._retry(self._flush, batch):
+            # Quedan en el log y se recuperan al arrancar otro proceso
+            return
+
+        last_seq = batch[-1]['seq']
+        with self._lock:
+            for operation in batch:
+                pending = self._pending.get(operation['user_id'], {})
+                key = (operation['kind'], operation['target_id'])
+                if pending.get(key) is operation:
+                    del pending[key]
+                    if not pending:
+                        del self._pending[operation['user_id']]
+            self._flushed_seq = max(self._flushed_seq, last_seq)
+            self.flushed += len(batch)
+            for _ in batch:
+                self._slots.release()
+            # Todo lo escrito en el log ya esta en la BD: se vacia; si no, se compacta a lo pendiente
+            if self._flushed_seq == self._seq:
+                self._log.truncate()
+            else:
+                pending = sorted((operation for operations in self._pending.values() for operation in operations.values()),
+                                 key=lambda operation: operation['seq'])
+                self._log.rotate(pending)
+
+    def _flush(self, operations):
+        # La ultima operacion por (usuario, tipo, destino) gana
+        latest = {}
+        for operation in operations:
+            latest[(operation['user_id'], operation['kind'], operation['target_id'])] = operation['op']
+
+        # Los ids borrados desde la validacion se descartan
+        user_ids = {user_id for user_id, _, _ in latest}
+        existing_users = set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+        for kind, (model, column) in KINDS.items():
+            adds = [(user_id, target_id) for (user_id, k, target_id), op in latest.items()
+                    if k == kind and op == 'add' and user_id in existing_users]
+            removes = [(user_id, target_id) for (user_id, k, target_id), op in latest.items()
+                       if k == kind and op == 'remove']
+            if adds:
+                targets = {target_id for _, target_id in adds}
+                existing = set(db.session.execute(select(model.id).where(model.id.in_(targets))).scalars())
+                rows = [{'user_id': user_id, 'planet_id': None, 'people_id': None, column.key: target_id}
+                        for user_id, target_id in adds if target_id in existing]
+                if rows:
+                    db.session.execute(insert_ignore(Favorite, ['user_id', column.key]), rows)
+            if removes:
+                db.session.execute(delete(Favorite).where(tuple_(Favorite.user_id, column).in_(removes)))
+        touched = {kind: {target_id for (_, k, target_id) in latest if k == kind} for kind in KINDS}
+        for statement in favorite_recounts(user_ids, touched['planet'], touched['people']):
+            db.session.execute(statement)
+        db.session.commit()
+
+    def _recover(self, retry):
+        # Un error de la BD al reproducir no debe matar el hilo: mismos reintentos que un lote
+        own = self._log.path if self._log is not None else None
+        for path, operations in orphan_logs(self.log_dir, own):
+            for offset in range(0, len(operations), self.batch_size):
+                batch = operations[offset:offset + self.batch_size]
+                if not retry:
+                    self._flush(batch)
+                elif not self._retry(self._flush, batch):
+                    # Parando: el log huerfano se queda para el siguiente proceso
+                    return False
+            os.remove(path)
+            if operations:
+                logger.warning('replayed %d favorite operations from %s', len(operations), path)
+        return True
+
+    def recover_orphans(self):
+        # Al crear la app: los logs de procesos muertos no esperan a la primera escritura de este
+        with self.app.app_context():
+            try:
+                self._recover(retry=False)
+            except Exception:
+                db.session.rollback()
+                logger.exception('could not replay orphan favorite logs, the writer thread will retry')
+            finally:
+                db.session.remove()
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            pending_users = len(self._pending)
+        return {
+            'queued': self.queue.qsize(),
+            'maxsize': self.maxsize,
+            'pending_users': pending_users,
+            'flushed': self.flushed,
+            'failures': self.failures,
+        }
+
+def favorites_queue():
+    return current_app.extensions.get('favorites_queue')
+
+def setup_favorites_queue(app):
+    if os.getenv('FAVORITES_WRITE_BEHIND', '0') != '1':
+        return
+
+    app.extensions['favorites_queue'] = writer = FavoritesQueue(
+        app,
+        maxsize=int(os.getenv('FAVORITES_QUEUE_SIZE', 10000)),
+        put_timeout=float(os.getenv('FAVORITES_QUEUE_TIMEOUT', 0.1)),
+        batch_size=int(os.getenv('FAVORITES_FLUSH_BATCH', 500)),
+        flush_interval=float(os.getenv('FAVORITES_FLUSH_INTERVAL', 0.2)),
+        log_dir=os.getenv('FAVORITES_LOG_DIR', '/tmp/favorites-log'),
+        fsync=os.getenv('FAVORITES_LOG_FSYNC', '1') == '1',
+    )
+    atexit.register(writer.stop)
+    writer.recover_orphans()
+
+    @app.errorhandler(QueueFull)
+    def queue_full(error):
+        # Contrapresion: el cliente reintenta mas tarde
+        response = jsonify({'error': 'Favorites queue is full, retry later'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    @app.route('/internal/favorites-queue', methods=['GET'])
+    def favorites_queue_stats():
+        return jsonify(writer.stats()), 200